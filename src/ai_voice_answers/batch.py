@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+
+'''
+Modo sem interface: responde diretórios (ou globs) de perguntas gravadas
+com o mesmo pipeline da janela (VAD -> codificação -> transcrição -> LLM
+-> TTS, no PipelineEngine), várias ao mesmo tempo, com um limite por etapa.
+
+ai-voice-answers batch ~/voicemail -o ~/answers
+ai-voice-answers batch "lectures/*.mp3" -o answers --llm-jobs 8
+
+Em out ficam o áudio de cada resposta e manifest.jsonl (uma linha por
+arquivo). Rodar de novo com o mesmo out continua de onde parou: os
+arquivos já respondidos (e não modificados desde então) são pulados.
+'''
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import hashlib
+import asyncio
+import argparse
+import tempfile
+
+from ai_voice_answers.modules import telemetry
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".opus", ".flac", ".m4a", ".aac", ".webm")
+
+# estados que não são refeitos ao continuar
+DONE_STATUS = ("ok", "no_speech")
+
+def find_audio_files(inputs, exclude_dir=None):
+    """
+    Arquivos de áudio de cada entrada: um arquivo, um diretório (recursivo)
+    ou um glob. Caminhos absolutos, sem repetição, em ordem.
+    Nada dentro de exclude_dir (as respostas, se out está dentro da entrada).
+    """
+    files = []
+    for item in inputs:
+        item = os.path.expanduser(item)
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files += [os.path.join(root, name) for name in names]
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            files += glob.glob(item, recursive=True)
+    files = [os.path.abspath(f) for f in files if f.lower().endswith(AUDIO_EXTENSIONS) and os.path.isfile(f)]
+    if exclude_dir is not None:
+        files = [f for f in files if not f.startswith(os.path.join(exclude_dir, ""))]
+    return sorted(set(files))
+
+def output_names(files):
+    """
+    Nome de saída de cada arquivo: o nome sem extensão, mais um hash do
+    caminho quando dois arquivos têm o mesmo nome.
+    """
+    stems = {}
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        stems.setdefault(stem, []).append(path)
+    names = {}
+    for stem, paths in stems.items():
+        for path in paths:
+            if len(paths) == 1:
+                names[path] = stem
+            else:
+                names[path] = stem + "-" + hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+    return names
+
+def file_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+def read_manifest(path):
+    """
+    Última linha de cada arquivo no manifest (uma linha cortada por uma
+    interrupção é ignorada).
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["file"]] = entry
+    return entries
+
+class BatchRunner:
+    """
+    Cada arquivo é uma tarefa engine.ask() (modules/engine.py), sem
+    histórico: decodificação, VAD e codificação são a etapa "decode" do
+    engine. Os limites do engine por etapa controlam quantos arquivos
+    estão em cada uma ao mesmo tempo (p. ex. poucos decodificando, que usa
+    CPU, e mais esperando a rede).
+    """
+    STAGES = ("decode", "transcription", "llm", "tts")
+
+    def __init__(self, config_gpt, out_dir, limits, language=None):
+        self.config_gpt = dict(config_gpt)
+        # uma resposta inteira por arquivo, sem trechos em streaming
+        self.config_gpt["stream_response"] = False
+        self.out_dir = out_dir
+        self.language = language or config_gpt["language"]
+        self.limits = {stage: max(1, int(limits[stage])) for stage in self.STAGES}
+        self.manifest_path = os.path.join(out_dir, "manifest.jsonl")
+
+    def write_entry(self, entry):
+        # só a thread do loop escreve
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+
+    async def process(self, engine, path, name):
+        turn = telemetry.Turn(pending=())
+        entry = {"file": path, "name": name}
+        entry.update(file_signature(path))
+        try:
+            res = await engine.ask(source=path, turn=turn, language=self.language)
+            if res.get("error") == "no_speech":
+                entry["status"] = "no_speech"
+                return entry
+            if "error" in res:
+                raise RuntimeError(res.get("message", res["error"]))
+            entry["transcription"] = res["transcription"]
+            entry["response"] = res["response"]
+
+            # só aparece em out quando está completo
+            out_path = os.path.join(self.out_dir, name + os.path.splitext(res["response_audio_path"])[1])
+            os.replace(res["response_audio_path"], out_path)
+            entry["response_audio"] = out_path
+            entry["status"] = "ok"
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        finally:
+            entry["times_ms"] = turn.to_dict()["totals_ms"]
+            entry["finished"] = time.time()
+        return entry
+
+    async def run_all(self, todo, names, tmp_dir, summary, stage_ms):
+        from ai_voice_answers.modules.engine import PipelineEngine
+
+        limits = dict(self.limits)
+        # os arquivos só esperam nas etapas, não na fila de perguntas
+        limits["jobs"] = len(todo) or 1
+        engine = PipelineEngine(lambda: self.config_gpt, tmp_dir, limits=limits, max_threads=sum(self.limits.values()))
+        t0 = time.perf_counter()
+        try:
+            tasks = [asyncio.ensure_future(self.process(engine, path, names[path])) for path in todo]
+            for n, task in enumerate(asyncio.as_completed(tasks), 1):
+                entry = await task
+                self.write_entry(entry)
+                summary[entry["status"]] += 1
+                for stage, ms in entry["times_ms"].items():
+                    stage_ms.setdefault(stage, []).append(ms)
+                elapsed = time.perf_counter() - t0
+                print("[{}/{}] {}: {}{} ({:.1f} files/min)".format(
+                        n, len(todo), os.path.basename(entry["file"]), entry["status"],
+                        ": " + entry["error"] if "error" in entry else "",
+                        60.0 * n / elapsed), flush=True)
+        finally:
+            engine.close()
+
+    def run(self, files, names, force=False):
+        """
+        Responde os arquivos que ainda não estão no manifest (todos com
+        force). Devolve os totais.
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        done = {} if force else read_manifest(self.manifest_path)
+        todo = []
+        for path in files:
+            entry = done.get(path)
+            if entry is not None and entry.get("status") in DONE_STATUS:
+                signature = file_signature(path)
+                if entry.get("size") == signature["size"] and entry.get("mtime") == signature["mtime"]:
+                    continue
+            todo.append(path)
+
+        summary = {"files": len(files), "skipped": len(files) - len(todo), "ok": 0, "no_speech": 0, "error": 0}
+        print("{} files, {} already answered, {} to do (stages: {})".format(
+                len(files), summary["skipped"], len(todo),
+                ", ".join("{} {}".format(stage, n) for stage, n in self.limits.items())), flush=True)
+
+        stage_ms = {}
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.out_dir)
+        t0 = time.perf_counter()
+        try:
+            asyncio.run(self.run_all(todo, names, tmp_dir, summary, stage_ms))
+        except KeyboardInterrupt:
+            # os arquivos em andamento são cancelados; ficam para a próxima vez
+            print("Interrupted", flush=True)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        elapsed = time.perf_counter() - t0
+        processed = summary["ok"] + summary["no_speech"] + summary["error"]
+        summary["seconds"] = round(elapsed, 3)
+        summary["files_per_minute"] = round(60.0 * processed / elapsed, 2) if elapsed > 0 else 0.0
+        summary["stage_mean_ms"] = {stage: round(sum(v) / len(v), 1) for stage, v in stage_ms.items()}
+        return summary
+
+
+def main(argv, config_manager):
+    parser = argparse.ArgumentParser(   prog="ai-voice-answers batch",
+                                        description="Answer recorded audio questions without the GUI")
+    parser.add_argument("inputs", nargs="+", help="audio files, directories or glob patterns")
+    parser.add_argument("-o", "--out", required=True, help="directory for the answers and manifest.jsonl")
+    parser.add_argument("--language", help="language of the questions and answers (default: config)")
+    parser.add_argument("--decode-jobs", type=int, default=2)
+    parser.add_argument("--transcribe-jobs", type=int, default=4)
+    parser.add_argument("--llm-jobs", type=int, default=4)
+    parser.add_argument("--tts-jobs", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="answer again files already in the manifest")
+    args = parser.parse_args(argv)
+
+    from ai_voice_answers.modules import http_pool
+
+    config_gpt = config_manager.get()
+    if len(config_gpt["api_key"].strip()) == 0:
+        print("No API key in", config_manager.path, file=sys.stderr)
+        return 2
+
+    out_dir = os.path.abspath(os.path.expanduser(args.out))
+    files = find_audio_files(args.inputs, exclude_dir=out_dir)
+    if not files:
+        print("No audio files found", file=sys.stderr)
+        return 1
+
+    runner = BatchRunner(   config_gpt,
+                            out_dir,
+                            {   "decode": args.decode_jobs,
+                                "transcription": args.transcribe_jobs,
+                                "llm": args.llm_jobs,
+                                "tts": args.tts_jobs},
+                            language=args.language)
+    try:
+        summary = runner.run(files, output_names(files), force=args.force)
+    finally:
+        http_pool.close_all()
+
+    print(json.dumps(summary))
+    return 1 if summary["error"] else 0
@@ -1,8 +1,98 @@
 import os
+import json
+import hashlib
+import threading
 import subprocess
 import ai_voice_answers.about as about
 from ai_voice_answers.modules.resources import resource_path
 
+# Hash (sha256), mtime e tamanho do que este programa instalou em cada caminho
+STAMP_PATH = os.path.join(  os.path.expanduser("~"),
+                            ".config", 
+                            about.__package__, 
+                            "desktop.stamp.json" )
+
+def load_stamp():
+    try:
+        with open(STAMP_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_stamp(stamp):
+    os.makedirs(os.path.dirname(STAMP_PATH), exist_ok=True)
+    with open(STAMP_PATH, 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, ensure_ascii=False, indent=4)
+
+def file_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def stamp_entry(stamp, path):
+    entry = stamp.get(path)
+    if isinstance(entry, str):  # formato antigo: só o hash
+        return {"digest": entry}
+    return entry
+
+def unchanged_on_disk(path, entry):
+    """
+    True se o arquivo ainda é o que escrevemos: mesmo mtime e tamanho do
+    stamp (sem ler o arquivo) ou, se eles mudaram, o mesmo hash.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size:
+        return True
+    return file_digest(path) == entry["digest"]
+
+def install_file(path, content, overwrite=False, mode=None, stamp=None):
+    """
+    Escreve content em path só se for preciso:
+    - o arquivo não existe;
+    - o arquivo é o que instalamos antes e content mudou (nova versão do
+      programa);
+    - overwrite=True e o arquivo foi editado ou corrompido.
+    Sem overwrite, um arquivo que não é nosso ou que o usuário editou não é
+    tocado. No caminho comum (arquivo existe, content igual ao do stamp) o
+    arquivo não é lido: só o stamp, e com overwrite um stat.
+    Com stamp (de load_stamp) quem chamou salva o stamp uma vez no fim com
+    save_stamp; sem ele o stamp é lido e salvo aqui.
+    Retorna True se o arquivo foi escrito.
+    """
+    own_stamp = stamp is None
+    if own_stamp:
+        stamp = load_stamp()
+    data = content.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    
+    if os.path.exists(path):
+        entry = stamp_entry(stamp, path)
+        if entry is None:
+            if not overwrite:
+                return False  # Evita sobrescrever
+        elif entry["digest"] == digest:
+            # content não mudou: sem overwrite nada a fazer
+            if not overwrite or unchanged_on_disk(path, entry):
+                return False
+        elif not overwrite and not unchanged_on_disk(path, entry):
+            return False  # editado pelo usuário
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if mode is not None:
+        os.chmod(path, mode)
+    
+    st = os.stat(path)
+    stamp[path] = {"digest": digest, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if own_stamp:
+        save_stamp(stamp)
+    return True
 
 def update_desktop_database(desktop_path):
     applications_dir = os.path.expanduser(desktop_path)
@@ -17,7 +107,20 @@ def update_desktop_database(desktop_path):
     except FileNotFoundError:
         print("The command 'update-desktop-database' was not found. Verify that the package 'desktop-file-utils' is installed.")
 
-def create_desktop_file(desktop_path, overwrite=False, program_name=None):
+def update_desktop_database_async(desktop_path):
+    """
+    Roda update-desktop-database em segundo plano (fora do caminho de inicialização).
+    """
+    thread = threading.Thread(target=update_desktop_database, args=(desktop_path,), daemon=True)
+    thread.start()
+    return thread
+
+def create_desktop_file(desktop_path, overwrite=False, program_name=None, update_database=True, stamp=None):
+    """
+    Retorna True se o arquivo .desktop foi (re)escrito. Nesse caso, com
+    update_database=False quem chamou deve atualizar a base de atalhos
+    (p. ex. com update_desktop_database_async).
+    """
 
     icon_path = resource_path('icons', 'logo.png')
 
@@ -43,19 +146,19 @@ StartupWMClass={about.__package__}
 """
     path = os.path.expanduser(os.path.join(desktop_path,f"{__program_name}.desktop"))
     
-    if not os.path.exists(path) or overwrite == True: 
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w") as f:
-            f.write(desktop_entry)
-        os.chmod(path, 0o755)
+    if install_file(path, desktop_entry, overwrite=overwrite, mode=0o755, stamp=stamp):
         print(f"File {__program_name}.desktop created in {path}.")
-        update_desktop_database(desktop_path)
+        if update_database:
+            update_desktop_database(desktop_path)
+        return True
+    return False
     
 def create_desktop_directory(   directory_name = "ResearchTools",
                                 long_name = "Scientific research",
                                 comment = "Tools for Writing and Research Support",
                                 icon = "accessories-text-editor", 
-                                overwrite = False):
+                                overwrite = False,
+                                stamp = None):
     
     desktop_entry = f"""[Desktop Entry]
 Version=1.0
@@ -66,16 +169,13 @@ Icon={icon}
 """
     path = os.path.expanduser(f"~/.local/share/desktop-directories/{directory_name}.directory")
     
-    if not os.path.exists(path) or overwrite == True:  # Evita sobrescrever
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w") as f:
-            f.write(desktop_entry)
-        os.chmod(path, 0o755)
+    if install_file(path, desktop_entry, overwrite=overwrite, mode=0o755, stamp=stamp):
         print(f"File {path} created.")
     
 def create_desktop_menu(directory_name = "ResearchTools",
                         basename = "research-tools",
-                        overwrite = False):
+                        overwrite = False,
+                        stamp = None):
     
     desktop_entry = f"""<!-- ~/.config/menus/applications-merged/{basename}.menu -->
 <Menu>
@@ -91,10 +191,7 @@ def create_desktop_menu(directory_name = "ResearchTools",
 """
     path = os.path.expanduser(f"~/.config/menus/applications-merged/{basename}.menu")
     
-    if not os.path.exists(path) or overwrite == True:  # Evita sobrescrever
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w") as f:
-            f.write(desktop_entry)
+    if install_file(path, desktop_entry, overwrite=overwrite, stamp=stamp):
         print(f"File {path} created.")
 
 if __name__ == '__main__':
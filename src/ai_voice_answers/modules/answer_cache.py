@@ -0,0 +1,280 @@
+#!/usr/bin/python3
+
+import os
+import re
+import json
+import time
+import zlib
+import tempfile
+import threading
+import unicodedata
+
+import numpy as np
+
+from ai_voice_answers.modules.disk_cache import make_key, file_lock
+
+
+def normalize_question(text):
+    """
+    Minúsculas, sem acentos, sem pontuação e com espaços simples.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def ngram_vector(text, dim=4096, n=3):
+    """
+    Vetor de n-gramas de caracteres (hashing trick com crc32), normalizado
+    para que o produto escalar seja a similaridade de cosseno.
+    """
+    padded = " " + text + " "
+    grams = [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+    idx = np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams),
+                      dtype=np.int64, count=len(grams))
+    vec = np.bincount(idx, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+class AnswerCache:
+    """
+    Cache de respostas para perguntas sem histórico (ask_once).
+    A resposta só depende do contexto (system prompt + modelo) e da pergunta:
+    - acerto exato: pergunta normalizada igual;
+    - acerto aproximado: maior similaridade de cosseno entre os vetores de
+      n-gramas (índice NumPy local) acima de threshold.
+    Guardado em dois arquivos só de acréscimo: path/vectors.f32 (uma linha
+    float32 por pergunta) e path/index.jsonl (um registro por put, por uso e
+    por remoção), então um put ou um acerto escrevem só uma linha. Acima de
+    max_entries as entradas usadas há mais tempo são removidas; quando o log
+    fica com muitos registros velhos os dois arquivos são reescritos.
+    Toda leitura e escrita em disco é feita sob um flock, então várias
+    instâncias do programa podem compartilhar o diretório.
+    """
+    def __init__(self, path, threshold=0.92, max_entries=2000, dim=4096):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.exact_hits = 0
+        self.approx_hits = 0
+        self.misses = 0
+
+        self.entries = []
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        # registros em index.jsonl (vivos e velhos)
+        self.log_records = 0
+        self.index_path = os.path.join(self.path, "index.jsonl")
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.lock_path = os.path.join(self.path, ".lock")
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _read_legacy(self):
+        # formato antigo: index.json + vectors.npy reescritos a cada put
+        index_path = os.path.join(self.path, "index.json")
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        if not (os.path.exists(index_path) and os.path.exists(vectors_path)):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            vectors = np.load(vectors_path)
+        except (ValueError, OSError):
+            return None
+        if vectors.shape != (len(entries), self.dim):
+            return None
+        return entries, vectors.astype(np.float32)
+
+    def _read(self):
+        """
+        Refaz o estado a partir do disco (chamado sob o flock).
+        Retorna (entries, vectors, registros no log).
+        """
+        empty = ([], np.zeros((0, self.dim), dtype=np.float32), 0)
+        if not os.path.exists(self.index_path):
+            return empty
+        try:
+            rows = np.fromfile(self.vectors_path, dtype=np.float32) if os.path.exists(self.vectors_path) else empty[1]
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            print("Error reading the answer cache, starting empty")
+            return empty
+        rows = rows[:rows.size // self.dim * self.dim].reshape(-1, self.dim)
+
+        by_key = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # linha cortada por uma interrupção
+            key = record.get("key")
+            if "row" in record:
+                if record["row"] < rows.shape[0]:
+                    by_key.pop(key, None)
+                    by_key[key] = record
+            elif record.get("drop"):
+                by_key.pop(key, None)
+            elif key in by_key:
+                by_key[key]["used"] = record["used"]
+
+        entries = list(by_key.values())
+        if not entries:
+            return [], empty[1], len(lines)
+        vectors = rows[[e.pop("row") for e in entries]]
+        return entries, vectors, len(lines)
+
+    def _load(self):
+        with file_lock(self.lock_path):
+            entries, vectors, records = self._read()
+            if records == 0:
+                legacy = self._read_legacy()
+                if legacy is not None:
+                    entries, vectors = legacy
+                    self._write(entries, vectors)
+                    records = len(entries)
+                    for name in ("index.json", "vectors.npy"):
+                        try:
+                            os.remove(os.path.join(self.path, name))
+                        except OSError:
+                            pass
+        self.entries = entries
+        self.vectors = vectors
+        self.log_records = records
+        if len(self.entries) > self.max_entries:
+            self._compact()
+
+    def _write(self, entries, vectors):
+        # reescreve os dois arquivos (sob o flock); as linhas ficam na ordem
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            np.ascontiguousarray(vectors, dtype=np.float32).tofile(f)
+        os.replace(tmp, self.vectors_path)
+
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for row, entry in enumerate(entries):
+                f.write(json.dumps(dict(entry, row=row), ensure_ascii=False) + "\n")
+        os.replace(tmp, self.index_path)
+
+    def _append(self, records, vector=None):
+        """
+        Acrescenta registros ao log (e o vetor do put, cuja linha em
+        vectors.f32 vai no primeiro registro).
+        """
+        row_bytes = 4 * self.dim
+        with file_lock(self.lock_path):
+            if vector is not None:
+                size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+                if size % row_bytes:
+                    # linha cortada por uma interrupção
+                    os.truncate(self.vectors_path, size - size % row_bytes)
+                records[0]["row"] = size // row_bytes
+                with open(self.vectors_path, "ab") as f:
+                    f.write(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.log_records += len(records)
+
+    def _compact(self):
+        """
+        Reescreve os arquivos só com as entradas vivas, no máximo
+        max_entries. Relê o disco antes: ele tem também o que outras
+        instâncias acrescentaram.
+        """
+        with file_lock(self.lock_path):
+            entries, vectors, _ = self._read()
+            if len(entries) > self.max_entries:
+                order = np.argsort([e["used"] for e in entries])
+                keep = np.sort(order[len(entries) - self.max_entries:])
+                entries = [entries[i] for i in keep]
+                vectors = vectors[keep]
+            self._write(entries, vectors)
+        self.entries = entries
+        self.vectors = vectors
+        self.log_records = len(entries)
+
+    def _touch(self, entry):
+        entry["used"] = time.time()
+        self._append([{"key": entry["key"], "used": entry["used"]}])
+
+    def get(self, context_key, question):
+        """
+        Retorna a resposta em cache ou None.
+        """
+        norm = normalize_question(question)
+        key = make_key(context_key, norm)
+        with self.lock:
+            if not self.entries:
+                self.misses += 1
+                return None
+
+            for entry in self.entries:
+                if entry["key"] == key:
+                    self.exact_hits += 1
+                    self._touch(entry)
+                    return entry["answer"]
+
+            same_context = np.array([e["context"] == context_key for e in self.entries])
+            sims = self.vectors @ ngram_vector(norm, self.dim)
+            sims[~same_context] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self.approx_hits += 1
+                self._touch(self.entries[best])
+                print("💬 Answer cache: similar question ({:.3f}): {}".format(
+                        float(sims[best]), self.entries[best]["question"]))
+                return self.entries[best]["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, context_key, question, answer):
+        norm = normalize_question(question)
+        key = make_key(context_key, norm)
+        with self.lock:
+            # a mesma pergunta substitui a entrada antiga
+            keep = [i for i, e in enumerate(self.entries) if e["key"] != key]
+            self.entries = [self.entries[i] for i in keep]
+            self.vectors = self.vectors[keep]
+
+            entry = {
+                "key": key,
+                "context": context_key,
+                "question": question,
+                "answer": answer,
+                "used": time.time()
+            }
+            vector = ngram_vector(norm, self.dim)
+            records = [dict(entry)]
+
+            self.entries.append(entry)
+            self.vectors = np.vstack([self.vectors, vector[None, :]])
+
+            if len(self.entries) > self.max_entries:
+                order = np.argsort([e["used"] for e in self.entries])
+                keep = np.sort(order[len(self.entries) - self.max_entries:])
+                dropped = set(range(len(self.entries))) - set(keep.tolist())
+                records += [{"key": self.entries[i]["key"], "drop": True} for i in sorted(dropped)]
+                self.entries = [self.entries[i] for i in keep]
+                self.vectors = self.vectors[keep]
+
+            self._append(records, vector)
+            # muitos registros velhos: reescreve
+            if self.log_records > 2 * len(self.entries) + 100:
+                self._compact()
+
+    def stats(self):
+        return {
+            "exact_hits": self.exact_hits,
+            "approx_hits": self.approx_hits,
+            "misses": self.misses,
+            "entries": len(self.entries)
+        }
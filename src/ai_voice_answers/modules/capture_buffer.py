@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+class CaptureBuffer:
+    """
+    Buffer int16 contíguo e pré-alocado para a gravação.
+    O callback do PortAudio escreve direto nele (sem listas de blocos nem
+    cópias extras) e view() devolve o áudio gravado sem copiar.
+    Quando enche, a capacidade cresce em blocos de grow_s segundos
+    (ou dobra, o que for maior), para que o crescimento seja raro.
+    """
+    def __init__(self, samplerate=16000, channels=1, prealloc_s=60.0, grow_s=60.0):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.grow_samples = int(grow_s * samplerate)
+        self.data = np.zeros((int(prealloc_s * samplerate), channels), dtype=np.int16)
+        self.length = 0
+        self.reallocs = 0
+
+    def write(self, block):
+        n = block.shape[0]
+        end = self.length + n
+        if end > self.data.shape[0]:
+            self._grow(end)
+        self.data[self.length:end] = block
+        self.length = end
+
+    def _grow(self, min_size):
+        new_size = max(min_size, self.data.shape[0] + self.grow_samples, 2 * self.data.shape[0])
+        new_data = np.zeros((new_size, self.channels), dtype=np.int16)
+        new_data[:self.length] = self.data[:self.length]
+        # Views antigas continuam válidas: apontam para o array anterior,
+        # cujo conteúdo já gravado não muda mais.
+        self.data = new_data
+        self.reallocs += 1
+
+    def view(self, start=0, end=None):
+        """
+        Retorna o áudio gravado entre start e end (em amostras) sem copiar.
+        """
+        if end is None:
+            end = self.length
+        return self.data[start:end]
+
+    @staticmethod
+    def rms(block):
+        """
+        RMS de um bloco int16, entre 0 e 1.
+        """
+        return float(np.sqrt(np.mean(np.square(block, dtype=np.float32)))) / 32768.0
+
+    def stats(self):
+        return {
+            "samples": self.length,
+            "seconds": self.length / float(self.samplerate),
+            "used_bytes": self.length * self.channels * 2,
+            "allocated_bytes": self.data.nbytes,
+            "reallocs": self.reallocs
+        }
@@ -1,5 +1,8 @@
 import os
 import json
+import copy
+import threading
+from types import MappingProxyType
 
 def verify_default_config(path,default_content={}):
     """
@@ -57,3 +60,48 @@ def save_config(path,content):
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(content, f, ensure_ascii=False, indent=4)
 
+def freeze(obj):
+    """
+    Cópia somente leitura: dicts viram MappingProxyType e listas viram tuplas.
+    """
+    if isinstance(obj, dict):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+class ConfigManager:
+    """
+    Lê o JSON de configuração uma vez e devolve sempre o mesmo objeto
+    imutável; só relê quando o mtime ou o tamanho do arquivo mudam
+    (um os.stat por chamada, sem abrir nem interpretar o arquivo).
+    Assim as edições feitas em "Configure LLM" valem já na próxima chamada.
+    """
+    def __init__(self, path, default_content=None):
+        self.path = path
+        self.default_content = default_content
+        self.signature = None
+        self.config = None
+        self.lock = threading.Lock()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        signature = self._signature()
+        with self.lock:
+            if self.config is None or signature != self.signature:
+                # merge_defaults altera os dicts: trabalha em uma cópia dos defaults
+                defaults = copy.deepcopy(self.default_content)
+                self.config = freeze(load_config(self.path, defaults))
+                self.signature = signature
+            return self.config
+
+    def invalidate(self):
+        with self.lock:
+            self.config = None
+
@@ -1,11 +1,103 @@
+import os
 
-from deep_consultation.core_audio     import speech_file_transcript_deepinfra
+import numpy as np
 
-def transcription_in_depth(system_data, filepath, language=None):
+from ai_voice_answers.modules.disk_cache import DiskCache, cache_dir, make_key
+from ai_voice_answers.modules.http_pool  import get_openai_client
 
-    OUT=speech_file_transcript_deepinfra(   system_data["base_url"],
-                                            system_data["api_key"],
-                                            system_data["model_transcript"],
-                                            filepath,
-                                            language=language)
-    return OUT    
+SYSTEM_PROMPT = (
+    "You are an expert in many fields. Answer concisely. "
+    "If unsure, admit it. Avoid trivial, redundant, or idle chatter. "
+    "You have no memory but can accept history. Your personality is stoic and spartan."
+)
+
+_transcription_cache = None
+
+def get_transcription_cache(max_mb=20):
+    """
+    Cache de transcrições compartilhado (em ~/.cache/ai_voice_answers/transcription).
+    """
+    global _transcription_cache
+    if _transcription_cache is None:
+        _transcription_cache = DiskCache(cache_dir("transcription"), suffix=".json")
+    _transcription_cache.max_bytes = int(max_mb * 1024 * 1024)
+    return _transcription_cache
+
+def transcription_cache_key(system_data, pcm, language=None):
+    """
+    A chave usa o PCM decodificado (não o arquivo codificado), então a mesma
+    gravação acerta o cache com qualquer upload_codec.
+    """
+    return make_key("transcription",
+                    system_data["model_transcript"],
+                    language or "",
+                    np.ascontiguousarray(pcm))
+
+def transcription_in_depth(system_data, audio, language=None):
+    """
+    audio pode ser o caminho de um arquivo ou uma tupla (filename, bytes)
+    com o áudio já codificado em memória (ver encoding.encode_audio).
+    """
+    if not isinstance(audio, tuple):
+        with open(audio, "rb") as f:
+            audio = (os.path.basename(audio), f.read())
+    return transcription_from_bytes(system_data, audio, language=language)
+
+def transcription_from_bytes(system_data, audio, language=None):
+    """
+    Mesma chamada de speech_file_transcript_deepinfra, mas envia
+    o áudio direto da memória, sem reler um arquivo do disco, pelo
+    cliente compartilhado (conexão keep-alive, ver http_pool).
+    """
+    client = get_openai_client(system_data["base_url"], system_data["api_key"])
+
+    kwargs = {}
+    if language:
+        kwargs["language"] = language
+
+    transcript = client.audio.transcriptions.create(
+        model=system_data["model_transcript"],
+        file=audio,
+        **kwargs
+    )
+    return transcript.text or ""
+
+def use_pooled_client(cdi, system_data):
+    """
+    Troca o cliente OpenAI do ChatDeepInfra pelo cliente compartilhado
+    (mesmo pool de conexões da transcrição). Também aplica mudanças de
+    base_url/api_key/model_llm do config sem perder o histórico.
+    """
+    cdi.client = get_openai_client(system_data["base_url"], system_data["api_key"])
+    cdi.model = system_data["model_llm"]
+    return cdi
+
+def chat_stream(cdi, user_msg, use_history=True):
+    """
+    Igual a cdi.chat()/cdi.ask_once(), mas devolve a resposta do LLM
+    em pedaços (tokens) à medida que chegam.
+    Ao terminar, atualiza o histórico do cdi se use_history for True.
+    """
+    messages = [{"role": "system", "content": cdi.system_prompt}]
+    if use_history:
+        messages.extend(cdi.history)
+    messages.append({"role": "user", "content": user_msg})
+
+    response = cdi.client.chat.completions.create(
+        model=cdi.model,
+        messages=messages,
+        stream=True,
+    )
+
+    output = ""
+    for event in response:
+        if not event.choices:
+            continue
+        content = getattr(event.choices[0].delta, "content", None)
+        if content:
+            output += content
+            yield content
+
+    if use_history:
+        cdi.history.append({"role": "user", "content": user_msg})
+        cdi.history.append({"role": "assistant", "content": output})
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+
+import time
+import threading
+
+# papel e separadores de cada mensagem no formato de chat da OpenAI
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You summarize conversations between a user and an assistant. "
+    "Keep names, numbers, decisions, open questions and anything the user asked to remember. "
+    "Write plain sentences in the language of the conversation, without preamble."
+)
+
+def estimate_tokens(text):
+    """
+    Estimativa sem tokenizador: ~4 caracteres por token (inglês/português).
+    Só precisa ser estável e da ordem certa, não exata.
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def prompt_tokens(system_prompt, history, question):
+    """
+    Tamanho estimado do prompt que cdi.chat()/chat_stream() enviam:
+    system prompt + histórico + pergunta.
+    """
+    return (estimate_tokens(system_prompt) + estimate_tokens(question) + 2 * MESSAGE_OVERHEAD_TOKENS
+            + sum(message_tokens(m) for m in history))
+
+
+class ContextWindow:
+    """
+    Histórico completo da conversa (o que a lista mostra) e a parte dele
+    que vai no prompt do LLM, dentro de context_max_tokens:
+    - os turnos antigos viram um resumo, enviado como o primeiro turno do
+      histórico (o system prompt do cdi é compartilhado com as perguntas
+      sem histórico e não muda);
+    - dos turnos ainda não resumidos, vão os mais recentes que cabem no
+      orçamento; os que não cabem ficam de fora (até entrarem no resumo).
+    O resumo é pedido numa thread depois de cada turno (commit), quando os
+    turnos não resumidos passam de metade do orçamento; a próxima pergunta
+    nunca espera por ele: se ainda não terminou, usa o resumo anterior.
+    """
+    # resume quando os turnos fora do resumo passam desta fração do orçamento
+    SUMMARIZE_AT = 0.5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = []
+        self.summary = ""
+        # messages[:summarized] já estão no resumo
+        self.summarized = 0
+        # muda em clear(): um resumo em andamento é descartado
+        self.generation = 0
+        self.summary_thread = None
+
+    def get_history(self):
+        with self.lock:
+            return list(self.messages)
+
+    def clear(self):
+        with self.lock:
+            self.messages = []
+            self.summary = ""
+            self.summarized = 0
+            self.generation += 1
+
+    def summary_messages(self, summary):
+        if not summary:
+            return []
+        return [{"role": "user", "content": "Summary of our earlier conversation:\n" + summary},
+                {"role": "assistant", "content": "Understood."}]
+
+    def window(self, system_prompt, question, max_tokens):
+        """
+        Devolve (histórico a enviar, estatísticas do prompt).
+        max_tokens <= 0 envia o histórico inteiro, como antes.
+        """
+        with self.lock:
+            summary = self.summary
+            recent = self.messages[self.summarized:]
+            summarized_turns = self.summarized // 2
+        head = self.summary_messages(summary)
+
+        if max_tokens <= 0:
+            selected = recent
+        else:
+            # turnos inteiros (pergunta + resposta), do mais recente para trás
+            budget = max_tokens - prompt_tokens(system_prompt, head, question)
+            start = len(recent)
+            while start >= 2:
+                cost = message_tokens(recent[start - 2]) + message_tokens(recent[start - 1])
+                if cost > budget:
+                    break
+                budget -= cost
+                start -= 2
+            selected = recent[start:]
+
+        history = head + selected
+        stats = {
+            "prompt_tokens": prompt_tokens(system_prompt, history, question),
+            "history_turns": len(selected) // 2,
+            "summarized_turns": summarized_turns,
+            "dropped_turns": (len(recent) - len(selected)) // 2,
+            "summary_tokens": estimate_tokens(summary)
+        }
+        return history, stats
+
+    def prepare(self, cdi, question, config_gpt):
+        """
+        Coloca no cdi o histórico da janela, antes de cdi.chat()/chat_stream()
+        (chamado com o TurnGate, então nenhuma outra pergunta com histórico
+        usa o cdi ao mesmo tempo). Devolve as estatísticas do prompt.
+        """
+        history, stats = self.window(cdi.system_prompt, question, config_gpt["context_max_tokens"])
+        cdi.history = history
+        return stats
+
+    def commit(self, question, answer, config_gpt):
+        """
+        Acrescenta o turno respondido e, se for o caso, começa o resumo.
+        """
+        with self.lock:
+            self.messages.append({"role": "user", "content": question})
+            self.messages.append({"role": "assistant", "content": answer})
+        self.maybe_summarize(config_gpt)
+
+    def maybe_summarize(self, config_gpt):
+        max_tokens = config_gpt["context_max_tokens"]
+        if not config_gpt["context_summarize"] or max_tokens <= 0:
+            return
+        if len(config_gpt["api_key"].strip()) == 0:
+            return
+        keep = 2 * max(0, int(config_gpt["context_keep_turns"]))
+        with self.lock:
+            if self.summary_thread is not None and self.summary_thread.is_alive():
+                return
+            recent = self.messages[self.summarized:]
+            if len(recent) <= keep:
+                return
+            if sum(message_tokens(m) for m in recent) <= self.SUMMARIZE_AT * max_tokens:
+                return
+            upto = len(self.messages) - keep
+            job = (self.generation, upto, self.summary, self.messages[self.summarized:upto])
+            self.summary_thread = threading.Thread(target=self._summarize, args=(job, dict(config_gpt)), daemon=True)
+            self.summary_thread.start()
+
+    def _summarize(self, job, config_gpt):
+        generation, upto, summary, messages = job
+        t = time.perf_counter()
+        conversation = "\n".join(
+            "{}: {}".format("User" if m["role"] == "user" else "Assistant", m["content"]) for m in messages
+        )
+        content = ""
+        if summary:
+            content += "Summary so far:\n" + summary + "\n\n"
+        content += "Conversation to add to the summary:\n" + conversation
+
+        from ai_voice_answers.modules.http_pool import get_openai_client
+        
+        client = get_openai_client(config_gpt["base_url"], config_gpt["api_key"])
+        try:
+            response = client.chat.completions.create(
+                model=config_gpt["model_llm"],
+                messages=[  {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                            {"role": "user", "content": content}],
+                max_tokens=config_gpt["context_summary_tokens"]
+            )
+            new_summary = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            # sem resumo a janela continua descartando os turnos antigos
+            print("History summarization failed:", e)
+            return
+        if not new_summary:
+            return
+
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.summary = new_summary
+            self.summarized = upto
+        print("🧮 History summarized: {} turns in {:.1f} s (~{} tokens)".format(
+                upto // 2, time.perf_counter() - t, estimate_tokens(new_summary)))
+
+    def wait(self, timeout=None):
+        """
+        Espera o resumo em andamento (se houver) terminar.
+        """
+        thread = self.summary_thread
+        if thread is not None:
+            thread.join(timeout)
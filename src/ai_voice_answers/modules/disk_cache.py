@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import ai_voice_answers.about as about
+
+
+def cache_dir(*parts):
+    """
+    Diretório de cache do programa: $XDG_CACHE_HOME/ai_voice_answers
+    (ou ~/.cache/ai_voice_answers).
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, about.__package__, *parts)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    flock exclusivo em path, entre as instâncias do programa (sem fcntl,
+    no Windows, só o arquivo é aberto).
+    """
+    with open(path, "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def make_key(*parts):
+    """
+    Chave de conteúdo: sha256 das partes (texto, bytes ou arrays contíguos,
+    p. ex. o PCM de uma gravação, sem copiar).
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        part = memoryview(part).cast("B")
+        h.update(part.nbytes.to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    Cache persistente em disco, endereçado por conteúdo (um arquivo por chave),
+    limitado a max_bytes com remoção LRU (o mtime do arquivo é atualizado a
+    cada acerto).
+    As escritas são atômicas (arquivo temporário + os.replace) e a remoção é
+    protegida por um flock, então várias instâncias do programa podem
+    compartilhar o mesmo diretório.
+    """
+    def __init__(self, path, max_bytes=100 * 1024 * 1024, suffix=""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.counter_lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    def _count(self, name):
+        with self.counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get_path(self, key):
+        """
+        Retorna o caminho do arquivo em cache ou None.
+        """
+        path = self._file(key)
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return path
+
+    def get(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # removido por outra instância
+            return None
+
+    def put(self, key, data):
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._file(key))
+        self.evict()
+        return self._file(key)
+
+    def put_file(self, key, src_path):
+        with open(src_path, "rb") as f:
+            return self.put(key, f.read())
+
+    def get_json(self, key):
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def put_json(self, key, obj):
+        return self.put(key, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    def evict(self):
+        """
+        Remove os arquivos usados há mais tempo até caber em max_bytes.
+        """
+        with file_lock(os.path.join(self.path, ".lock")):
+            entries = []
+            total = 0
+            for entry in os.scandir(self.path):
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self._count("evictions")
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / float(total) if total else 0.0
+        }
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+
+import io
+import wave
+from pydub import AudioSegment
+
+# codec -> (extensão do arquivo, formato do ffmpeg, codec do ffmpeg)
+CODECS = {
+    "wav":  ("wav",  None,   None),
+    "flac": ("flac", "flac", None),
+    "opus": ("ogg",  "ogg",  "libopus"),
+    "mp3":  ("mp3",  "mp3",  None),
+}
+
+def encode_audio(audio_int16, samplerate, codec="wav", bitrate=None):
+    """
+    Codifica o áudio int16 mono em memória, sem arquivo temporário.
+    Retorna (filename, bytes), no formato aceito pelo campo file da API.
+
+    codec: "wav" (sem compressão, não usa ffmpeg), "flac", "opus" ou "mp3".
+    bitrate: usado por "opus" e "mp3", p. ex. "32k".
+    """
+    if codec not in CODECS:
+        raise ValueError("Unknown upload codec: "+str(codec)+". Use one of: "+", ".join(CODECS))
+
+    ext, fmt, ffmpeg_codec = CODECS[codec]
+    buffer = io.BytesIO()
+
+    if codec == "wav":
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(samplerate)
+            wf.writeframes(audio_int16.tobytes())
+    else:
+        audio_segment = AudioSegment(
+            audio_int16.tobytes(),
+            frame_rate=samplerate,
+            sample_width=2,
+            channels=1
+        )
+        kwargs = {}
+        if ffmpeg_codec:
+            kwargs["codec"] = ffmpeg_codec
+        if bitrate and codec in ("opus", "mp3"):
+            kwargs["bitrate"] = bitrate
+        audio_segment.export(buffer, format=fmt, **kwargs)
+
+    return "audio."+ext, buffer.getvalue()
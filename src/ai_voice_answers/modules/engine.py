@@ -0,0 +1,551 @@
+#!/usr/bin/python3
+
+import io
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_voice_answers.modules                import telemetry
+from ai_voice_answers.modules.turn_gate      import TurnGate
+from ai_voice_answers.modules.text_stream    import SentenceSplitter
+from ai_voice_answers.modules.context_window import ContextWindow, prompt_tokens
+from ai_voice_answers.modules.disk_cache     import cache_dir, make_key
+
+SAMPLERATE = 16000
+
+_answer_cache = None
+
+def get_answer_cache(config_gpt):
+    from ai_voice_answers.modules.answer_cache import AnswerCache
+
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(cache_dir("answers"))
+    _answer_cache.threshold = config_gpt["answer_cache_similarity"]
+    _answer_cache.max_entries = config_gpt["answer_cache_max_entries"]
+    return _answer_cache
+
+def load_pcm(source, samplerate=SAMPLERATE):
+    """
+    Decodifica um arquivo de áudio (caminho ou (filename, bytes)) para
+    int16 mono em samplerate (o formato da gravação).
+    """
+    import numpy as np
+    from pydub import AudioSegment
+
+    if isinstance(source, tuple):
+        filename, data = source
+        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else None
+        audio = AudioSegment.from_file(io.BytesIO(data), format=ext)
+    else:
+        audio = AudioSegment.from_file(source)
+    audio = audio.set_channels(1).set_frame_rate(samplerate).set_sample_width(2)
+    return np.array(audio.get_array_of_samples(), dtype=np.int16).reshape(-1, 1)
+
+def prepare_audio(config_gpt, source=None, pcm=None, samplerate=SAMPLERATE):
+    """
+    Arquivo (source) ou PCM int16 -> (pcm sem o silêncio das pontas,
+    áudio para upload), como a janela faz com a gravação; (pcm vazio, None)
+    se não há fala. Bloqueante (roda no executor, com o turno ativo).
+    """
+    from ai_voice_answers.modules.vad      import trim_silence
+    from ai_voice_answers.modules.encoding import encode_audio
+
+    if source is not None:
+        with telemetry.span("decode"):
+            pcm = load_pcm(source, samplerate)
+    if config_gpt["vad_trim"] and pcm.shape[0] > 0:
+        with telemetry.span("vad"):
+            pcm, _ = trim_silence(  pcm, samplerate,
+                                    energy_threshold=config_gpt["vad_energy_threshold"],
+                                    zcr_threshold=config_gpt["vad_zcr_threshold"],
+                                    padding_ms=config_gpt["vad_padding_ms"],
+                                    max_pause_ms=config_gpt["vad_max_pause_ms"])
+    if pcm.shape[0] == 0:
+        return pcm, None
+    with telemetry.span("encode"):
+        upload = encode_audio(pcm, samplerate, codec=config_gpt["upload_codec"], bitrate=config_gpt["upload_bitrate"])
+    return pcm, upload
+
+def transcribe(config_gpt, audio, pcm=None, transcriber=None, turn=None, language=None):
+    """
+    Cache de transcrição -> transcrição incremental -> arquivo inteiro.
+    Bloqueante (roda numa thread do executor).
+    """
+    from ai_voice_answers.modules.consult import transcription_in_depth
+    from ai_voice_answers.modules.consult import transcription_cache_key
+    from ai_voice_answers.modules.consult import get_transcription_cache
+
+    language = language or config_gpt["language"]
+    cache = None
+    if config_gpt["transcription_cache"] and pcm is not None:
+        cache = get_transcription_cache(config_gpt["transcription_cache_max_mb"])
+        key = transcription_cache_key(config_gpt, pcm, language)
+
+        if not config_gpt["transcription_cache_bypass"]:
+            entry = cache.get_json(key)
+            print("📝 Transcription cache:", cache.stats())
+            if entry is not None:
+                if transcriber is not None:
+                    transcriber.cancel()
+                if turn is not None:
+                    turn.set("transcription_source", "cache")
+                return entry["text"]
+
+    transcription = None
+    if transcriber is not None:
+        try:
+            transcription = transcriber.finish()
+        except Exception as e:
+            print("Incremental transcription failed, sending the whole audio:", e)
+
+    if transcription is None:
+        transcription = transcription_in_depth(config_gpt, audio, language=language)
+        source = "upload"
+    else:
+        source = "incremental"
+    if turn is not None:
+        turn.set("transcription_source", source)
+
+    if cache is not None:
+        cache.put_json(key, {"text": transcription})
+    return transcription
+
+
+class Conversation:
+    """
+    Estado de uma conversa com histórico: o cdi (ChatDeepInfra), o
+    ContextWindow (histórico completo e janela enviada ao LLM), a sessão do
+    arquivo (session_store.Session ou None) e o TurnGate que põe as
+    perguntas com histórico na ordem em que foram feitas.
+    """
+    def __init__(self, session=None):
+        self.cdi = None
+        self.context = ContextWindow()
+        self.session = session
+        self.gate = TurnGate()
+
+    def clear(self):
+        if self.cdi is not None:
+            self.cdi.clear_history()
+        self.context.clear()
+
+
+class PipelineEngine:
+    """
+    Pipeline transcrição -> LLM -> TTS (e reprodução) em asyncio, sem Qt:
+    usado pela janela (via EngineLoop), pelo modo batch e pelo servidor.
+    - ask() responde uma pergunta (já codificada, um arquivo a decodificar
+      ou PCM); o progresso sai por on_event(nome, valor):
+      "started", "api_key", "transcription", "partial_response",
+      "response", "audio_chunk" (caminho de um trecho, no modo streaming)
+      e "done";
+    - cada etapa (decode, transcription, llm, tts, playback) tem um limite de concorrência (limits, um asyncio.Semaphore
+      por etapa; "jobs" limita as perguntas inteiras);
+    - as chamadas bloqueantes (HTTP, ffmpeg, SQLite, PortAudio) rodam num
+      ThreadPoolExecutor, com o telemetry.Turn ativo na thread;
+    - cancelar a tarefa de ask() ou play() interrompe a pergunta (o
+      streaming do LLM para no próximo token) ou a reprodução.
+    """
+    DEFAULT_LIMITS = {"jobs": 2, "decode": 2, "transcription": 4, "llm": 4, "tts": 4, "playback": 1}
+
+    def __init__(self, get_config, dir_temp, limits=None, max_threads=16):
+        self.get_config = get_config
+        self.dir_temp = dir_temp
+        self.limits = dict(self.DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="engine")
+        self.semaphores = {}
+        # cdi das perguntas sem conversa (sem histórico)
+        self.default_cdi = None
+
+    def set_limit(self, stage, n):
+        """
+        Novo limite para a etapa; vale para as próximas tarefas.
+        """
+        n = max(1, int(n))
+        if self.limits.get(stage) != n:
+            self.limits[stage] = n
+            self.semaphores.pop(stage, None)
+
+    def semaphore(self, stage):
+        # criado dentro do loop (no Python 3.8/3.9 o Semaphore se liga ao loop atual)
+        sem = self.semaphores.get(stage)
+        if sem is None:
+            sem = self.semaphores[stage] = asyncio.Semaphore(self.limits[stage])
+        return sem
+
+    @staticmethod
+    def _call(turn, span, fn, args, kwargs):
+        telemetry.activate(turn)
+        try:
+            if span is None:
+                return fn(*args, **kwargs)
+            with telemetry.span(span):
+                return fn(*args, **kwargs)
+        finally:
+            telemetry.activate(None)
+
+    async def run_blocking(self, stage, turn, fn, *args, span=None, **kwargs):
+        """
+        fn(*args) numa thread do executor, dentro do limite da etapa (stage
+        None não tem limite) e com o span do turno em volta.
+        """
+        loop = asyncio.get_running_loop()
+        if stage is None:
+            return await loop.run_in_executor(self.executor, self._call, turn, span, fn, args, kwargs)
+        async with self.semaphore(stage):
+            return await loop.run_in_executor(self.executor, self._call, turn, span, fn, args, kwargs)
+
+    def ensure_cdi(self, conversation, config_gpt):
+        """
+        Um cdi por conversa (o histórico), com o cliente HTTP compartilhado.
+        """
+        from deep_consultation.chat_deepinfra import ChatDeepInfra
+        from ai_voice_answers.modules.consult  import use_pooled_client, SYSTEM_PROMPT
+
+        cdi = conversation.cdi if conversation is not None else self.default_cdi
+        if cdi is None:
+            cdi = ChatDeepInfra(config_gpt["base_url"], config_gpt["api_key"], config_gpt["model_llm"])
+            if conversation is not None:
+                conversation.cdi = cdi
+            else:
+                self.default_cdi = cdi
+        use_pooled_client(cdi, config_gpt)
+        cdi.set_system_prompt(SYSTEM_PROMPT)
+        return cdi
+
+    async def ask(  self, audio=None, pcm=None, transcriber=None, question=None, use_history=False,
+                    conversation=None, turn=None, on_event=None, language=None, source=None,
+                    samplerate=SAMPLERATE, stream_response=None):
+        """
+        Responde uma pergunta: audio (caminho ou (filename, bytes)) já
+        pronto para transcrever, source (um arquivo qualquer) ou só pcm a
+        passar pelo VAD e pela codificação na etapa "decode", ou question já
+        em texto. Com use_history usa (e atualiza) o histórico da
+        conversation. stream_response (None: o da configuração) força ou
+        desliga a resposta em streaming, com o áudio frase a frase.
+        Devolve um dict com a transcrição, a resposta e o áudio (com "error"
+        se falhou); cancelar a tarefa levanta CancelledError.
+        """
+        emit = on_event if on_event is not None else (lambda name, value=None: None)
+        use_history = use_history and conversation is not None
+        # o número é tirado antes de qualquer await: a ordem é a das chamadas
+        ticket = conversation.gate.new_ticket() if use_history else None
+        try:
+            async with self.semaphore("jobs"):
+                return await self._ask(audio, pcm, transcriber, question, use_history, conversation,
+                                       ticket, turn, emit, language, source, samplerate, stream_response)
+        except asyncio.CancelledError:
+            self.fail_turn(turn, "cancelled")
+            raise
+        except Exception as e:
+            print("Error processing the audio:", e)
+            self.fail_turn(turn, str(e))
+            return {"error": "exception", "message": str(e)}
+        finally:
+            # em qualquer saída (sem chave, sem fala, erro): a thread do
+            # transcritor não fica esperando trechos para sempre
+            if transcriber is not None:
+                transcriber.cancel()
+            if ticket is not None:
+                conversation.gate.release(ticket)
+            if turn is not None:
+                turn.done("processing")
+
+    @staticmethod
+    def fail_turn(turn, message):
+        # sem resposta não há o que tocar
+        if turn is not None:
+            turn.set("error", message)
+            turn.done("playback")
+
+    async def _ask( self, audio, pcm, transcriber, question, use_history, conversation, ticket, turn, emit,
+                    language, source, samplerate, stream_response):
+        from ai_voice_answers.modules.http_pool  import stats as http_stats
+        from ai_voice_answers.modules.work_audio import text_to_audio_file
+        from ai_voice_answers.modules.work_audio import get_tts_cache
+        from ai_voice_answers.modules.consult    import SYSTEM_PROMPT
+
+        emit("started")
+        config_gpt = self.get_config()
+
+        if len(config_gpt["api_key"].strip()) == 0:
+            self.fail_turn(turn, "no_api_key")
+            return {"error": "no_api_key"}
+        emit("api_key")
+
+        language = language or config_gpt["language"]
+
+        if question is None and audio is None:
+            pcm, audio = await self.run_blocking("decode", turn, prepare_audio, config_gpt, source, pcm, samplerate)
+            if audio is None:
+                self.fail_turn(turn, "no_speech")
+                return {"error": "no_speech"}
+
+        if question is None:
+            question = await self.run_blocking( "transcription", turn, transcribe,
+                                                config_gpt, audio, pcm, transcriber, turn, language,
+                                                span="transcription")
+        transcription = question.strip()
+        emit("transcription", transcription)
+        print("📝 Transcription: " + transcription)
+
+        cdi = self.ensure_cdi(conversation if use_history else None, config_gpt)
+
+        # espera as perguntas anteriores entrarem no histórico
+        if ticket is not None:
+            await conversation.gate.wait(ticket)
+
+        # Sem histórico a resposta só depende de (system prompt, modelo, pergunta)
+        answer_cache = None
+        cached_res = None
+        if config_gpt["answer_cache"] and not use_history:
+            answer_cache = get_answer_cache(config_gpt)
+            context_key = make_key(SYSTEM_PROMPT, config_gpt["model_llm"])
+            cached_res = answer_cache.get(context_key, transcription)
+            print("💬 Answer cache:", answer_cache.stats())
+
+        # Com histórico só vai a janela (resumo + turnos recentes) do ContextWindow
+        if cached_res is not None:
+            prompt_stats = {"prompt_tokens": 0}
+        elif use_history:
+            prompt_stats = conversation.context.prepare(cdi, transcription, config_gpt)
+        else:
+            prompt_stats = {"prompt_tokens": prompt_tokens(SYSTEM_PROMPT, [], transcription)}
+        if turn is not None:
+            for key, value in prompt_stats.items():
+                turn.set(key, value)
+        if "history_turns" in prompt_stats:
+            print("🧮 Prompt: ~{prompt_tokens} tokens ({history_turns} turns of history, "
+                  "{summarized_turns} summarized, {dropped_turns} dropped)".format(**prompt_stats))
+        else:
+            print("🧮 Prompt: ~{prompt_tokens} tokens".format(**prompt_stats))
+
+        tts_cache = get_tts_cache(config_gpt["tts_cache_max_mb"]) if config_gpt["tts_cache"] else None
+        if stream_response is None:
+            stream_response = config_gpt["stream_response"]
+        streamed = stream_response and cached_res is None
+        if streamed:
+            res, res_audio_path = await self.stream_answer(cdi, transcription, use_history, config_gpt,
+                                                           language, tts_cache, turn, emit)
+            if use_history:
+                conversation.context.commit(transcription, res, config_gpt)
+        else:
+            if cached_res is not None:
+                res = cached_res
+            else:
+                ask = cdi.chat if use_history else cdi.ask_once
+                res = (await self.run_blocking("llm", turn, ask, transcription, span="llm")).strip()
+                if turn is not None:
+                    turn.mark("llm_first_token")
+                    turn.mark("llm_last_token")
+                if use_history:
+                    conversation.context.commit(transcription, res, config_gpt)
+        # a próxima pergunta com histórico já pode ir ao LLM
+        if ticket is not None:
+            conversation.gate.release(ticket)
+
+        emit("response", res)
+        print("📝 Response: ", res)
+
+        if not streamed:
+            res_audio_path = await self.run_blocking(   "tts", turn, text_to_audio_file,
+                                                        res, language, self.dir_temp,
+                                                        cache=tts_cache, system_data=config_gpt, span="tts")
+
+        if answer_cache is not None and cached_res is None:
+            answer_cache.put(context_key, transcription, res)
+
+        if config_gpt["tts_cache"]:
+            print("🔊 TTS cache:", get_tts_cache().stats())
+        print("🌐 HTTP connections:", http_stats())
+
+        if turn is not None:
+            turn.set("streamed", streamed)
+            turn.set("use_history", use_history)
+            turn.set("answer_cache_hit", cached_res is not None)
+            turn.set("question_chars", len(transcription))
+            turn.set("answer_chars", len(res))
+
+        session = conversation.session if conversation is not None else None
+        if session is not None:
+            await self.run_blocking(None, turn, session.add_turn,
+                                    transcription, res,
+                                    language = language,
+                                    model = config_gpt["model_llm"],
+                                    use_history = use_history,
+                                    transcription_source = turn.attrs.get("transcription_source") if turn else None,
+                                    audio_path = res_audio_path,
+                                    keep_audio = config_gpt["session_keep_audio"],
+                                    timing = turn.to_dict() if turn else None,
+                                    span = "archive")
+
+        emit("done", res)
+        return {
+            "transcription" : transcription,
+            "transcription_audio" : audio,
+            "response": res,
+            "response_audio_path": res_audio_path,
+            "streamed": streamed,
+            "turn": turn
+        }
+
+    async def stream_answer(self, cdi, question, use_history, config_gpt, language, tts_cache, turn, emit):
+        """
+        Consome a resposta do LLM token a token (numa thread do executor),
+        corta em frases e sintetiza cada frase como uma tarefa, enquanto o
+        LLM continua gerando. Os trechos de áudio saem em "audio_chunk" na
+        ordem das frases.
+        """
+        from ai_voice_answers.modules.consult    import chat_stream
+        from ai_voice_answers.modules.work_audio import text_to_audio_file
+        from ai_voice_answers.modules.work_audio import concat_audio_files
+
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for token in chat_stream(cdi, question, use_history=use_history):
+                    if stop.is_set():
+                        # fecha a resposta HTTP; o histórico não é atualizado
+                        break
+                    if turn is not None:
+                        turn.mark("llm_first_token")
+                    loop.call_soon_threadsafe(tokens.put_nowait, token)
+                if turn is not None and not stop.is_set():
+                    turn.mark("llm_last_token")
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        async def synthesize(sentence):
+            return await self.run_blocking( "tts", turn, text_to_audio_file,
+                                            sentence, language, self.dir_temp,
+                                            cache=tts_cache, system_data=config_gpt, span="tts")
+
+        chunk_paths = []
+        pending = asyncio.Queue()
+
+        async def emit_in_order():
+            while True:
+                task = await pending.get()
+                if task is None:
+                    return
+                path = await task
+                chunk_paths.append(path)
+                emit("audio_chunk", path)
+
+        def add_sentence(sentence):
+            task = loop.create_task(synthesize(sentence))
+            tasks.append(task)
+            pending.put_nowait(task)
+
+        tasks = []
+        emitter = loop.create_task(emit_in_order())
+        splitter = SentenceSplitter(min_chars=config_gpt["stream_min_sentence_chars"])
+        res = ""
+        last_emit = 0.0
+        try:
+            async with self.semaphore("llm"):
+                producer = loop.run_in_executor(self.executor, self._call, turn, "llm", produce, (), {})
+                while True:
+                    token = await tokens.get()
+                    if token is None:
+                        break
+                    res += token
+                    for sentence in splitter.feed(token):
+                        add_sentence(sentence)
+
+                    # Atualiza o status no máximo a cada 100 ms
+                    now = time.monotonic()
+                    if now - last_emit > 0.1:
+                        emit("partial_response", res)
+                        last_emit = now
+                # erros do LLM aparecem aqui
+                await producer
+
+            rest = splitter.flush()
+            if rest:
+                add_sentence(rest)
+            pending.put_nowait(None)
+            await emitter
+        except BaseException:
+            stop.set()
+            emitter.cancel()
+            for task in tasks:
+                task.cancel()
+            raise
+
+        # Arquivo único com a resposta completa, para "Save as" e "Play response"
+        res_audio_path = await self.run_blocking(None, turn, concat_audio_files, chunk_paths, self.dir_temp)
+        return res.strip(), res_audio_path
+
+    async def play(self, audio_path, factor=1.0, turn=None, generation=None):
+        """
+        Toca o arquivo (uma reprodução por vez); cancelar interrompe em no
+        máximo um bloco de áudio. generation (de playback_generation(),
+        pego quando a reprodução foi pedida): um stop_playback() depois do
+        pedido também interrompe esta.
+        """
+        from ai_voice_answers.modules.work_audio import play_audio_file
+
+        if generation is None:
+            generation = self.playback_generation()
+        try:
+            async with self.semaphore("playback"):
+                # decodificação, time-stretch e início da reprodução entram no turno
+                await self.run_blocking(None, turn, play_audio_file, audio_path, factor, generation)
+        except asyncio.CancelledError:
+            self.stop_playback()
+            raise
+        finally:
+            if turn is not None:
+                turn.done("playback")
+
+    def playback_generation(self):
+        from ai_voice_answers.modules.playback import get_playback_engine
+
+        return get_playback_engine().current_generation()
+
+    def stop_playback(self):
+        """
+        Não bloqueia: pode ser chamado pela thread da UI.
+        """
+        from ai_voice_answers.modules.playback import get_playback_engine
+
+        get_playback_engine().stop()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class EngineLoop:
+    """
+    Um loop do asyncio numa thread própria, para usar o PipelineEngine de
+    código que não é asyncio (a janela Qt): submit(coro) devolve um
+    concurrent.futures.Future.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="engine-loop", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, fn, *args):
+        """
+        Chama fn(*args) na thread do loop (p. ex. ações sobre o TurnGate).
+        """
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def close(self, timeout=5.0):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+
+import time
+from collections import OrderedDict
+
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QApplication, QAbstractItemView
+from PyQt5.QtGui import QColor, QKeySequence
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect, QTimer, QEvent
+
+ROLE_ROLE = Qt.UserRole + 1
+
+COLORS = {
+    "user": QColor("#d1e7dd"),       # verde claro
+    "assistant": QColor("#f8d7da")   # vermelho claro
+}
+
+MARGIN = 5
+
+
+class HistoryModel(QAbstractListModel):
+    """
+    Mensagens do histórico ({"role", "content"}) para o HistoryView.
+    sync() só insere as mensagens novas (beginInsertRows), então a view
+    não é reconstruída a cada turno.
+    Com um pager (session_store.Pager) o modelo mostra o arquivo de
+    sessões: a view pede a próxima página (fetchMore) quando a rolagem
+    chega ao fim, então abrir um arquivo enorme só carrega page_size turnos.
+    """
+    def __init__(self, parent=None, pager=None, page_size=100):
+        super().__init__(parent)
+        self.messages = []
+        self.pager = pager
+        self.page_size = page_size
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        msg = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return msg["content"]
+        if role == Qt.ToolTipRole:
+            if "time" in msg:
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(msg["time"])) + "\n\n" + msg["content"]
+            return msg["content"]
+        if role == ROLE_ROLE:
+            return msg["role"]
+        if role == Qt.BackgroundRole:
+            return COLORS.get(msg["role"])
+        return None
+
+    def append_messages(self, messages):
+        if not messages:
+            return
+        first = len(self.messages)
+        self.beginInsertRows(QModelIndex(), first, first + len(messages) - 1)
+        self.messages.extend(dict(m) for m in messages)
+        self.endInsertRows()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return self.pager is not None and not parent.isValid() and not self.pager.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        messages = []
+        for turn in self.pager.next_page(self.page_size):
+            messages.append({"role": "user", "content": turn["question"], "time": turn["created"]})
+            messages.append({"role": "assistant", "content": turn["answer"], "time": turn["created"]})
+        self.append_messages(messages)
+
+    def sync(self, history):
+        """
+        Acrescenta o que o histórico tem além do que já está no modelo.
+        Se o histórico não começa com as mesmas mensagens (foi limpo ou
+        resumido), recomeça do zero.
+        """
+        n = len(self.messages)
+        same_prefix = (len(history) >= n and
+                       (n == 0 or (history[n - 1]["content"] == self.messages[n - 1]["content"] and
+                                   history[0]["content"] == self.messages[0]["content"])))
+        if not same_prefix:
+            self.clear()
+            n = 0
+        self.append_messages(history[n:])
+
+    def clear(self):
+        self.beginResetModel()
+        self.messages = []
+        self.endResetModel()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """
+    Desenha cada mensagem (fundo pela role, texto com quebra de linha)
+    direto no viewport: nenhuma mensagem é um widget, e só as linhas
+    visíveis são pintadas.
+    A altura de cada texto é medida uma vez por largura e guardada num
+    cache LRU de (texto, largura) com até cache_size entradas (0 desliga),
+    então refazer o layout de mensagens já vistas é só uma consulta.
+    """
+    def __init__(self, view, cache_size=20000):
+        super().__init__(view)
+        self.view = view
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def text_width(self):
+        return max(50, self.view.layout_width - 2 * MARGIN)
+
+    def text_height(self, text, font_metrics, width):
+        key = (text, width)
+        height = self.cache.get(key)
+        if height is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return height
+        
+        self.misses += 1
+        height = font_metrics.boundingRect(0, 0, width, 1000000, Qt.TextWordWrap, text).height()
+        if self.cache_size > 0:
+            self.cache[key] = height
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return height
+
+    def invalidate(self):
+        """
+        Limpa o cache (a fonte mudou).
+        """
+        self.cache.clear()
+
+    def sizeHint(self, option, index):
+        width = self.text_width()
+        height = self.text_height(index.data(Qt.DisplayRole), option.fontMetrics, width)
+        return QSize(width + 2 * MARGIN, height + 2 * MARGIN)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        color = index.data(Qt.BackgroundRole)
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            painter.setPen(option.palette.highlightedText().color())
+        else:
+            if color is not None:
+                painter.fillRect(option.rect, color)
+            painter.setPen(option.palette.text().color())
+
+        text_rect = QRect(option.rect).adjusted(MARGIN, MARGIN, -MARGIN, -MARGIN)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, index.data(Qt.DisplayRole))
+        painter.restore()
+
+
+class HistoryView(QListView):
+    """
+    Lista do histórico sobre HistoryModel + MessageDelegate.
+    Ao redimensionar, o layout (largura das mensagens) só é refeito
+    resize_debounce_ms depois do último evento de resize (0 refaz a cada
+    evento); enquanto isso só as linhas visíveis são repintadas.
+    O QListView pede a altura (sizeHint) de todas as linhas a cada
+    relayout; em modo Batched ele faz isso batch_size linhas por vez,
+    voltando ao loop de eventos entre um lote e outro, então um relayout
+    do histórico inteiro não trava a UI (batch_size 0 faz tudo de uma vez).
+    Ctrl+C copia as mensagens selecionadas.
+    """
+    def __init__(self, model=None, parent=None, resize_debounce_ms=120, cache_size=20000, batch_size=100):
+        super().__init__(parent)
+        self.layout_width = 0
+        self.resize_debounce_ms = resize_debounce_ms
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.timeout.connect(self.apply_width)
+        
+        self.setModel(model if model is not None else HistoryModel(self))
+        self.setItemDelegate(MessageDelegate(self, cache_size=cache_size))
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        # o relayout no resize é feito por apply_width()
+        self.setResizeMode(QListView.Fixed)
+        # com milhares de mensagens o layout é feito em lotes, sem travar a UI
+        if batch_size > 0:
+            self.setLayoutMode(QListView.Batched)
+            self.setBatchSize(batch_size)
+        else:
+            self.setLayoutMode(QListView.SinglePass)
+        self.setSpacing(1)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.resize_debounce_ms <= 0 or self.layout_width == 0:
+            self.apply_width()
+        else:
+            self.resize_timer.start(self.resize_debounce_ms)
+
+    def apply_width(self):
+        width = self.viewport().width()
+        if width != self.layout_width:
+            self.layout_width = width
+            self.scheduleDelayedItemsLayout()
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.FontChange and isinstance(self.itemDelegate(), MessageDelegate):
+            self.itemDelegate().invalidate()
+            self.scheduleDelayedItemsLayout()
+        super().changeEvent(event)
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            texts = [self.model().index(row).data(Qt.DisplayRole) for row in rows]
+            QApplication.clipboard().setText("\n\n".join(texts))
+            return
+        super().keyPressEvent(event)
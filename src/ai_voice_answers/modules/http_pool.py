@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+import threading
+
+from openai import OpenAI, DefaultHttpxClient
+import requests
+from requests.adapters import HTTPAdapter
+
+from ai_voice_answers.modules import telemetry
+
+
+class ConnectionStats:
+    """
+    Conta as requisições feitas pelos clientes OpenAI e quantas abriram
+    conexão nova (DNS + TCP + TLS); as outras reaproveitaram uma conexão
+    keep-alive do pool. Os eventos vêm do trace do httpcore (e também
+    marcam, no turno atual, o tempo de upload e de espera da resposta).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def trace(self, event_name, info):
+        telemetry.http_event(event_name, info)
+        if event_name == "connection.connect_tcp.complete":
+            with self.lock:
+                self.new_connections += 1
+        elif event_name in ("http11.send_request_headers.started",
+                            "http2.send_request_headers.started"):
+            with self.lock:
+                self.requests += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": max(0, self.requests - self.new_connections)
+            }
+
+
+OPENAI_STATS = ConnectionStats()
+
+def _add_trace(request):
+    request.extensions["trace"] = OPENAI_STATS.trace
+
+
+_lock = threading.Lock()
+_openai_clients = {}
+_session = None
+
+def get_openai_client(base_url, api_key):
+    """
+    Um cliente OpenAI por (base_url, api_key), compartilhado pelo processo
+    todo (transcrição e chat): o pool de conexões do httpx fica aberto entre
+    um turno e outro.
+    """
+    base_url = base_url.strip() if base_url else ""
+    key = (base_url, api_key)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            http_client = DefaultHttpxClient(event_hooks={"request": [_add_trace]})
+            if base_url:
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            else:
+                client = OpenAI(api_key=api_key, http_client=http_client)
+            _openai_clients[key] = client
+        return client
+
+def get_requests_session():
+    """
+    requests.Session compartilhada (TTS), com keep-alive por host.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def requests_stats():
+    """
+    Mesmas contagens para a sessão do requests (lidas dos pools do urllib3).
+    """
+    if _session is None:
+        return {"requests": 0, "new_connections": 0, "reused_connections": 0}
+    n_requests = 0
+    n_connections = 0
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            n_requests += pool.num_requests
+            n_connections += pool.num_connections
+    return {
+        "requests": n_requests,
+        "new_connections": n_connections,
+        "reused_connections": max(0, n_requests - n_connections)
+    }
+
+def stats():
+    return {
+        "openai": OPENAI_STATS.stats(),
+        "tts": requests_stats()
+    }
+
+def close_all():
+    global _session
+    with _lock:
+        for client in _openai_clients.values():
+            client.close()
+        _openai_clients.clear()
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+import queue
+import threading
+
+from ai_voice_answers.modules.consult    import transcription_in_depth
+from ai_voice_answers.modules.encoding   import encode_audio
+
+class IncrementalTranscriber:
+    """
+    Transcreve em segundo plano os trechos de áudio entregues pelo
+    AudioRecorder durante a gravação (cortados nas pausas da fala).
+    Ao final, finish() espera o último trecho e junta as transcrições parciais.
+    """
+    def __init__(self, system_data, samplerate, language=None):
+        self.system_data = system_data
+        self.samplerate = samplerate
+        self.language = language
+        
+        self.texts = []
+        self.error = None
+        self.result = None
+        self.cancelled = False
+        
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add_chunk(self, audio):
+        """
+        Recebe um trecho de áudio int16 (chamado pela thread do PortAudio,
+        por isso só coloca na fila).
+        """
+        self.queue.put(audio)
+
+    def _run(self):
+        while True:
+            audio = self.queue.get()
+            if audio is None:
+                break
+            if self.cancelled or self.error is not None:
+                continue
+            
+            try:
+                upload = encode_audio(  audio, 
+                                        self.samplerate, 
+                                        codec=self.system_data["upload_codec"],
+                                        bitrate=self.system_data["upload_bitrate"])
+                text = transcription_in_depth(  self.system_data, 
+                                                upload, 
+                                                language=self.language)
+                
+                text = text.strip()
+                if text:
+                    self.texts.append(text)
+                print("📝 [chunk "+str(len(self.texts))+"] "+text)
+            except Exception as e:
+                self.error = e
+
+    def finish(self):
+        """
+        Espera a transcrição do último trecho e retorna o texto completo.
+        Se algum trecho falhou, relança a exceção.
+        """
+        if self.result is None:
+            self.queue.put(None)
+            self.thread.join()
+            if self.error is not None:
+                raise self.error
+            self.result = " ".join(self.texts)
+        return self.result
+
+    def cancel(self):
+        self.cancelled = True
+        self.queue.put(None)
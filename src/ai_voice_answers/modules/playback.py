@@ -0,0 +1,241 @@
+#!/usr/bin/python3
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from pydub import AudioSegment
+
+from ai_voice_answers.modules import telemetry
+
+
+def decode_audio_file(audio_path):
+    """
+    Decodifica o arquivo (mp3, wav, ...) uma única vez para um array
+    float32 com formato (amostras, canais) entre -1 e 1.
+    """
+    audio = AudioSegment.from_file(audio_path)
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    samples = samples.reshape(-1, audio.channels)
+    samples /= float(1 << (8 * audio.sample_width - 1))
+    return samples, audio.frame_rate
+
+
+def time_stretch(samples, samplerate, factor, frame_ms=40.0, search_ms=10.0):
+    """
+    Muda a velocidade sem alterar o pitch (WSOLA: overlap-add de janelas
+    Hann com 50% de sobreposição, cada janela deslocada até search_ms para
+    ficar em fase com a anterior).
+    A busca da melhor posição é feita por produto matricial (em um sinal
+    decimado) e o overlap-add final é todo vetorizado.
+    """
+    if factor == 1.0 or samples.shape[0] == 0:
+        return samples
+
+    N = int(samplerate * frame_ms / 1000.0) // 2 * 2
+    Hs = N // 2
+    Ha = Hs * factor
+    delta = int(samplerate * search_ms / 1000.0)
+    dec = 4
+
+    mono = samples.mean(axis=1)
+    # padding para que todas as janelas e buscas caibam no sinal
+    pad = np.zeros(int(np.ceil(Ha)) + N + 2 * delta, dtype=np.float32)
+    mono_p = np.concatenate([pad, mono, pad])
+    x_p = np.concatenate([np.zeros((pad.size, samples.shape[1]), np.float32),
+                          samples,
+                          np.zeros((pad.size, samples.shape[1]), np.float32)])
+
+    n_frames = int((samples.shape[0] - N) / Ha) + 2
+    positions = np.empty(n_frames, dtype=np.int64)
+    positions[0] = pad.size
+    offsets = np.arange(-delta, delta + 1, dec)
+    idx = np.arange(0, N, dec)
+
+    for k in range(1, n_frames):
+        # continuação natural da janela anterior
+        target = mono_p[positions[k - 1] + Hs + idx]
+        ideal = pad.size + int(round(k * Ha))
+        candidates = mono_p[ideal + offsets[:, None] + idx[None, :]]
+        positions[k] = ideal + offsets[np.argmax(candidates @ target)]
+
+    window = np.hanning(N + 1)[:N].astype(np.float32)[:, None]
+    frames = x_p[positions[:, None] + np.arange(N)[None, :]] * window[None, :, :]
+
+    # com 50% de sobreposição cada trecho de saída é a soma de duas janelas
+    out = np.empty(((n_frames + 1) * Hs, samples.shape[1]), dtype=np.float32)
+    out[:Hs] = frames[0, :Hs]
+    out[Hs:n_frames * Hs] = (frames[1:, :Hs] + frames[:-1, Hs:]).reshape(-1, samples.shape[1])
+    out[n_frames * Hs:] = frames[-1, Hs:]
+
+    out_len = int(samples.shape[0] / factor)
+    return out[:out_len]
+
+
+class PlaybackEngine:
+    """
+    Toca arquivos de áudio por um OutputStream persistente do sounddevice.
+    O áudio decodificado é guardado por arquivo e o áudio já acelerado por
+    (arquivo, fator), em um cache LRU limitado a max_cache_bytes, então
+    tocar de novo é imediato e mudar a velocidade não decodifica de novo.
+    O áudio é escrito em blocos de block_ms; stop() aborta o stream e a
+    reprodução termina em no máximo um bloco, liberando o dispositivo.
+    Cada play_file guarda a geração em que foi pedido; stop() passa para a
+    próxima, então uma reprodução interrompida nunca volta a tocar, mesmo
+    que outra comece antes de ela ver a interrupção.
+    """
+    def __init__(self, max_cache_bytes=64 * 1024 * 1024, block_ms=20.0):
+        self.max_cache_bytes = max_cache_bytes
+        self.block_ms = block_ms
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.stream = None
+        # lock: segurado enquanto o stream está em uso
+        self.lock = threading.Lock()
+        # state_lock: curto, protege o cache, a geração e a referência ao
+        # stream (load() e stop() rodam em outras threads enquanto ele toca)
+        self.state_lock = threading.Lock()
+        self.generation = 0
+
+    def _cache_get(self, key):
+        with self.state_lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            return None
+
+    def _cache_put(self, key, value):
+        samples, samplerate = value
+        with self.state_lock:
+            # duas threads podem ter decodificado o mesmo arquivo
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.cache_bytes -= old[0].nbytes
+            self.cache[key] = value
+            self.cache_bytes += samples.nbytes
+            while self.cache_bytes > self.max_cache_bytes and len(self.cache) > 1:
+                _, (old, _) = self.cache.popitem(last=False)
+                self.cache_bytes -= old.nbytes
+
+    def clear_cache(self):
+        with self.state_lock:
+            self.cache.clear()
+            self.cache_bytes = 0
+
+    def _stopped(self, generation):
+        return self.generation != generation
+
+    def load(self, audio_path, factor=1.0):
+        """
+        Retorna (samples, samplerate) já com a velocidade ajustada.
+        """
+        st = os.stat(audio_path)
+        file_key = (audio_path, st.st_mtime_ns, st.st_size)
+
+        stretched = self._cache_get(file_key + (factor,))
+        if stretched is not None:
+            return stretched
+
+        decoded = self._cache_get(file_key + (1.0,))
+        if decoded is None:
+            with telemetry.span("decode"):
+                decoded = decode_audio_file(audio_path)
+            self._cache_put(file_key + (1.0,), decoded)
+        if factor == 1.0:
+            return decoded
+
+        samples, samplerate = decoded
+        with telemetry.span("time_stretch"):
+            stretched = (time_stretch(samples, samplerate, factor), samplerate)
+        self._cache_put(file_key + (factor,), stretched)
+        return stretched
+
+    def _get_stream(self, samplerate, channels):
+        # importado só aqui: decodificar e acelerar não precisam do PortAudio
+        import sounddevice as sd
+        
+        if (self.stream is None or
+            self.stream.samplerate != samplerate or
+            self.stream.channels != channels):
+            self.close()
+            stream = sd.OutputStream(   samplerate=samplerate,
+                                        channels=channels,
+                                        dtype="float32",
+                                        latency="low")
+            stream.start()
+            with self.state_lock:
+                self.stream = stream
+        return self.stream
+
+    def current_generation(self):
+        """
+        Geração atual: pego quando a reprodução é pedida e passado a
+        play_file, um stop() entre o pedido e o início também a interrompe.
+        """
+        with self.state_lock:
+            return self.generation
+
+    def play_file(self, audio_path, factor=1.0, generation=None):
+        """
+        Toca o arquivo (bloqueante). Retorna False se foi interrompido por stop().
+        """
+        if generation is None:
+            generation = self.current_generation()
+        samples, samplerate = self.load(audio_path, factor)
+        if self._stopped(generation):
+            return False
+
+        with self.lock:
+            if self._stopped(generation):
+                return False
+            stream = self._get_stream(samplerate, samples.shape[1])
+            block = max(1, int(samplerate * self.block_ms / 1000.0))
+            for start in range(0, samples.shape[0], block):
+                if self._stopped(generation):
+                    # descarta o que já estava no buffer do dispositivo
+                    self.close(abort=True)
+                    return False
+                try:
+                    stream.write(samples[start:start + block])
+                except Exception:
+                    # stop() abortou o stream no meio da escrita
+                    if self._stopped(generation):
+                        self.close(abort=True)
+                        return False
+                    raise
+                if start == 0:
+                    telemetry.mark("playback_start")
+        return True
+
+    def stop(self):
+        """
+        Interrompe a reprodução atual sem esperar (chamado pela thread da
+        UI): passa para a próxima geração e aborta o stream, descartando o
+        que está no buffer do dispositivo. A thread que toca vê a geração
+        nova em no máximo um bloco e fecha o stream.
+        """
+        with self.state_lock:
+            self.generation += 1
+            if self.stream is not None:
+                self.stream.abort()
+        print("⏹️ Playback interrupted")
+
+    def close(self, abort=False):
+        # a referência sai sob state_lock: stop() nunca aborta um stream fechado
+        with self.state_lock:
+            stream, self.stream = self.stream, None
+        if stream is not None:
+            if abort:
+                stream.abort()
+            else:
+                stream.stop()
+            stream.close()
+
+_engine = None
+
+def get_playback_engine():
+    global _engine
+    if _engine is None:
+        _engine = PlaybackEngine()
+    return _engine
@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+
+from ai_voice_answers.modules.telemetry import state_dir
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    created REAL NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    language TEXT,
+    model TEXT,
+    use_history INTEGER,
+    transcription_source TEXT,
+    audio_path TEXT,
+    timing TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_session ON turns(session_id, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    question, answer, content='turns', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts(turns_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+END;
+"""
+
+COLUMNS = "id, session_id, created, question, answer, audio_path"
+
+def fts_query(text):
+    """
+    Cada palavra vira um prefixo entre aspas ("golden"* "rat"*): o que o
+    usuário digita nunca é interpretado como sintaxe do FTS5.
+    """
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+
+
+class SessionStore:
+    """
+    Arquivo das conversas num SQLite (por padrão em
+    ~/.local/state/ai_voice_answers/sessions.sqlite3): cada turno guarda
+    pergunta (a transcrição), resposta, tempos (telemetry.Turn) e, se
+    pedido, uma cópia do áudio da resposta (o diretório temporário é
+    apagado ao sair).
+    Em modo WAL: as perguntas do engine gravam por uma conexão (com lock) e a
+    UI lê por outra sem ser bloqueada pelas gravações. O índice FTS5 da
+    pergunta e da resposta é mantido por triggers; sem FTS5 no SQLite, a
+    busca cai para LIKE.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.audio_dir = os.path.join(os.path.dirname(path), "session_audio")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.write_lock = threading.Lock()
+        self.read_lock = threading.Lock()
+
+        self.writer = self._connect()
+        self.writer.executescript(SCHEMA)
+        try:
+            self.writer.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self.writer.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+        self.writer.commit()
+        self.reader = self._connect()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # com WAL, NORMAL não corrompe o banco; no máximo perde o último turno numa queda de energia
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def new_session(self):
+        return Session(self)
+
+    def create_session(self):
+        with self.write_lock:
+            cur = self.writer.execute("INSERT INTO sessions(started) VALUES (?)", (time.time(),))
+            self.writer.commit()
+            return cur.lastrowid
+
+    def add_turn(   self, session_id, question, answer, language=None, model=None, use_history=None,
+                    transcription_source=None, audio_path=None, keep_audio=False, timing=None):
+        """
+        Grava um turno; devolve o id (ou None se a gravação falhou).
+        Com keep_audio o áudio da resposta é copiado para audio_dir.
+        """
+        stored_audio = None
+        if keep_audio and audio_path and os.path.isfile(audio_path):
+            os.makedirs(self.audio_dir, exist_ok=True)
+            stored_audio = os.path.join(self.audio_dir, uuid.uuid4().hex + os.path.splitext(audio_path)[1])
+            try:
+                shutil.copyfile(audio_path, stored_audio)
+            except OSError as e:
+                print("Error saving the answer audio:", e)
+                stored_audio = None
+
+        row = ( session_id, time.time(), question, answer, language, model,
+                None if use_history is None else int(use_history),
+                transcription_source, stored_audio,
+                json.dumps(timing, ensure_ascii=False) if timing is not None else None)
+        try:
+            with self.write_lock:
+                cur = self.writer.execute(
+                    "INSERT INTO turns(session_id, created, question, answer, language, model, use_history, "
+                    "transcription_source, audio_path, timing) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                self.writer.commit()
+                return cur.lastrowid
+        except sqlite3.Error as e:
+            print("Error writing the session store:", e)
+            return None
+
+    def page(self, before_id=None, limit=100):
+        """
+        Turnos mais recentes primeiro, com id < before_id (paginação por
+        chave: o custo de uma página não depende do tamanho do arquivo).
+        """
+        sql = "SELECT " + COLUMNS + " FROM turns"
+        args = []
+        if before_id is not None:
+            sql += " WHERE id < ?"
+            args.append(before_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self.read_lock:
+            return [dict(r) for r in self.reader.execute(sql, args)]
+
+    def search(self, text, offset=0, limit=100):
+        """
+        Turnos cuja pergunta ou resposta contém as palavras de text
+        (as mais relevantes primeiro com FTS5, senão as mais recentes).
+        """
+        if self.fts:
+            sql = ("SELECT " + ", ".join("turns." + c.strip() for c in COLUMNS.split(",")) +
+                   " FROM turns_fts JOIN turns ON turns.id = turns_fts.rowid"
+                   " WHERE turns_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?")
+            args = [fts_query(text), limit, offset]
+        else:
+            words = text.split()
+            sql = "SELECT " + COLUMNS + " FROM turns"
+            if words:
+                sql += " WHERE " + " AND ".join("(question LIKE ? OR answer LIKE ?)" for _ in words)
+            sql += " ORDER BY id DESC LIMIT ? OFFSET ?"
+            args = []
+            for word in words:
+                args += ["%" + word + "%"] * 2
+            args += [limit, offset]
+        with self.read_lock:
+            try:
+                return [dict(r) for r in self.reader.execute(sql, args)]
+            except sqlite3.OperationalError as e:
+                print("Error searching the session store:", e)
+                return []
+
+    def pager(self, text=""):
+        return Pager(self, text)
+
+    def count(self):
+        with self.read_lock:
+            return self.reader.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    def close(self):
+        with self.write_lock, self.read_lock:
+            self.writer.close()
+            self.reader.close()
+
+
+class Session:
+    """
+    Uma conversa (do início do programa ou do último "Clear History").
+    A linha em sessions só é criada no primeiro turno gravado.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.id = None
+        self.lock = threading.Lock()
+
+    def add_turn(self, question, answer, **kwargs):
+        with self.lock:
+            if self.id is None:
+                try:
+                    self.id = self.store.create_session()
+                except sqlite3.Error as e:
+                    print("Error writing the session store:", e)
+                    return None
+        return self.store.add_turn(self.id, question, answer, **kwargs)
+
+
+class Pager:
+    """
+    Páginas sucessivas de turnos para HistoryModel.fetchMore: o arquivo
+    todo (mais recentes primeiro) ou o resultado de uma busca.
+    """
+    def __init__(self, store, text=""):
+        self.store = store
+        self.text = text.strip()
+        self.last_id = None
+        self.offset = 0
+        self.exhausted = False
+
+    def next_page(self, limit=100):
+        if self.exhausted:
+            return []
+        if self.text:
+            turns = self.store.search(self.text, self.offset, limit)
+            self.offset += len(turns)
+        else:
+            turns = self.store.page(self.last_id, limit)
+            if turns:
+                self.last_id = turns[-1]["id"]
+        if len(turns) < limit:
+            self.exhausted = True
+        return turns
+
+
+_store = None
+
+def get_session_store(path=None):
+    global _store
+    if _store is None:
+        _store = SessionStore(path or state_dir("sessions.sqlite3"))
+    return _store
+
+def shutdown():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,293 @@
+#!/usr/bin/python3
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ai_voice_answers.about as about
+
+
+def state_dir(*parts):
+    """
+    Diretório de estado do programa: $XDG_STATE_HOME/ai_voice_answers
+    (ou ~/.local/state/ai_voice_answers).
+    """
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, about.__package__, *parts)
+
+
+_local = threading.local()
+
+def activate(turn):
+    """
+    Define o turno da thread atual: span() e mark() das funções chamadas
+    nesta thread (playback, http_pool) passam a registrar nele.
+    """
+    _local.turn = turn
+
+def current():
+    return getattr(_local, "turn", None)
+
+@contextmanager
+def span(name):
+    turn = current()
+    if turn is None:
+        yield
+        return
+    with turn.span(name):
+        yield
+
+def mark(name):
+    turn = current()
+    if turn is not None:
+        turn.mark(name)
+
+
+class Turn:
+    """
+    Tempos de um turno (uma pergunta): spans (início e duração em ms desde
+    o início do turno) e marcas pontuais (p. ex. primeiro token do LLM).
+    O turno é gravado (uma linha JSONL + métricas) quando todas as partes
+    em pending terminaram: o processamento e o início da reprodução (ou a
+    reprodução ser descartada).
+    """
+    def __init__(self, recorder=None, pending=("processing", "playback")):
+        self.recorder = recorder
+        self.t0 = time.perf_counter()
+        self.lock = threading.Lock()
+        self.spans = []
+        self.marks = {}
+        self.attrs = {"time": time.time()}
+        self.pending = set(pending)
+        self.closed = False
+        self._open = threading.local()
+
+    def _ms(self, t):
+        return round(1000.0 * (t - self.t0), 3)
+
+    def add_span(self, name, duration_s, start_s=None):
+        """
+        Span medido fora do turno (p. ex. gravação e codificação, antes do
+        turno existir); start_s relativo ao início do turno.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.spans.append({ "name": name,
+                                "start_ms": round(1000.0 * start_s, 3) if start_s is not None else None,
+                                "ms": round(1000.0 * duration_s, 3)})
+
+    @contextmanager
+    def span(self, name):
+        stack = getattr(self._open, "stack", None)
+        if stack is None:
+            stack = self._open.stack = []
+        stack.append(name)
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            with self.lock:
+                if not self.closed:
+                    self.spans.append({ "name": name,
+                                        "start_ms": self._ms(t),
+                                        "ms": self._ms(time.perf_counter()) - self._ms(t)})
+
+    def open_span(self):
+        """
+        Span mais interno aberto na thread atual (usado para nomear as
+        fases das requisições HTTP).
+        """
+        stack = getattr(self._open, "stack", None)
+        return stack[-1] if stack else None
+
+    def mark(self, name):
+        """
+        Marca pontual; só a primeira ocorrência de cada nome conta.
+        """
+        with self.lock:
+            if not self.closed and name not in self.marks:
+                self.marks[name] = self._ms(time.perf_counter())
+
+    def set(self, key, value):
+        with self.lock:
+            self.attrs[key] = value
+
+    def done(self, part):
+        with self.lock:
+            self.pending.discard(part)
+            if self.pending or self.closed:
+                return
+            self.closed = True
+        if self.recorder is not None:
+            self.recorder.record(self)
+
+    def to_dict(self):
+        with self.lock:
+            out = dict(self.attrs)
+            out["spans"] = list(self.spans)
+            out["marks"] = dict(self.marks)
+            totals = {}
+            for s in self.spans:
+                totals[s["name"]] = round(totals.get(s["name"], 0.0) + s["ms"], 3)
+            out["totals_ms"] = totals
+            return out
+
+
+def http_event(event_name, info):
+    """
+    Eventos do trace do httpcore (ver http_pool): separa, no turno da thread
+    atual, o envio da requisição (upload) da espera pela resposta.
+    """
+    turn = current()
+    if turn is None:
+        return
+    now = time.perf_counter()
+    state = turn._open
+    if event_name.endswith("send_request_headers.started"):
+        state.http_start = now
+    elif event_name.endswith("send_request_body.complete"):
+        state.http_sent = now
+    elif event_name.endswith("receive_response_headers.complete"):
+        start = getattr(state, "http_start", None)
+        sent = getattr(state, "http_sent", None)
+        if start is None or sent is None:
+            return
+        name = turn.open_span() or "http"
+        turn.add_span(name + "_upload", sent - start, start - turn.t0)
+        turn.add_span(name + "_wait", now - sent, sent - turn.t0)
+        state.http_start = state.http_sent = None
+
+
+class Metrics:
+    """
+    Histogramas por etapa no formato texto do Prometheus.
+    """
+    BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.turns = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+
+    def observe(self, stage, ms):
+        with self.lock:
+            h = self.histograms.get(stage)
+            if h is None:
+                h = self.histograms[stage] = {"buckets": [0] * len(self.BUCKETS_MS), "sum": 0.0, "count": 0}
+            for i, le in enumerate(self.BUCKETS_MS):
+                if ms <= le:
+                    h["buckets"][i] += 1
+            h["sum"] += ms / 1000.0
+            h["count"] += 1
+
+    def render(self):
+        prefix = about.__package__
+        lines = [
+            "# TYPE {}_turns_total counter".format(prefix),
+            "{}_turns_total {}".format(prefix, self.turns),
+            "# TYPE {}_turn_errors_total counter".format(prefix),
+            "{}_turn_errors_total {}".format(prefix, self.errors),
+            "# TYPE {}_prompt_tokens_total counter".format(prefix),
+            "{}_prompt_tokens_total {}".format(prefix, self.prompt_tokens),
+            "# TYPE {}_stage_seconds histogram".format(prefix)
+        ]
+        with self.lock:
+            for stage, h in sorted(self.histograms.items()):
+                for le, n in zip(self.BUCKETS_MS, h["buckets"]):
+                    lines.append('{}_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(prefix, stage, le / 1000.0, n))
+                lines.append('{}_stage_seconds_bucket{{stage="{}",le="+Inf"}} {}'.format(prefix, stage, h["count"]))
+                lines.append('{}_stage_seconds_sum{{stage="{}"}} {:.6f}'.format(prefix, stage, h["sum"]))
+                lines.append('{}_stage_seconds_count{{stage="{}"}} {}'.format(prefix, stage, h["count"]))
+        return "\n".join(lines) + "\n"
+
+
+class TurnRecorder:
+    """
+    Grava cada turno como uma linha JSONL em path (rotacionado em max_bytes)
+    e alimenta as métricas.
+    """
+    def __init__(self, path, max_bytes=10 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.metrics = Metrics()
+        self.server = None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def new_turn(self):
+        return Turn(recorder=self)
+
+    def record(self, turn):
+        data = turn.to_dict()
+        for stage, ms in data["totals_ms"].items():
+            self.metrics.observe(stage, ms)
+        for name, ms in data["marks"].items():
+            self.metrics.observe(name, ms)
+        with self.metrics.lock:
+            self.metrics.turns += 1
+            if "error" in data:
+                self.metrics.errors += 1
+            self.metrics.prompt_tokens += data.get("prompt_tokens", 0)
+
+        line = json.dumps(data, ensure_ascii=False) + "\n"
+        with self.lock:
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print("Error writing the telemetry log:", e)
+
+    def serve_metrics(self, port, host="127.0.0.1"):
+        """
+        Endpoint /metrics (Prometheus) só no localhost, numa thread.
+        """
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print("📈 Metrics at http://{}:{}/metrics".format(host, self.server.server_address[1]))
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+_recorder = None
+
+def get_turn_recorder(path=None):
+    global _recorder
+    if _recorder is None:
+        _recorder = TurnRecorder(path or state_dir("turns.jsonl"))
+    return _recorder
+
+def shutdown():
+    if _recorder is not None:
+        _recorder.close()
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+
+import re
+
+# Fim de frase: pontuação seguida de espaço, ou quebra de linha
+SENTENCE_END = re.compile(r'([.!?…;:]+["\')\]]*)(\s+)|(\n+)')
+
+class SentenceSplitter:
+    """
+    Recebe o texto do LLM em pedaços (tokens) e devolve frases completas
+    assim que um limite de frase é encontrado.
+    Frases muito curtas são juntadas com a seguinte para evitar
+    chamadas de TTS com poucas palavras.
+    """
+    def __init__(self, min_chars=40):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        """
+        Adiciona texto ao buffer e retorna a lista de frases completas.
+        """
+        self.buffer += text
+        sentences = []
+        start = 0
+        for m in SENTENCE_END.finditer(self.buffer):
+            end = m.end()
+            if len(self.buffer[start:end].strip()) < self.min_chars:
+                continue
+            sentences.append(self.buffer[start:end].strip())
+            start = end
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """
+        Retorna o que sobrou no buffer (última frase sem pontuação final).
+        """
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return rest
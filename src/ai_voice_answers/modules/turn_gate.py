@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+
+import asyncio
+
+class TurnGate:
+    """
+    Ordena uma etapa entre tarefas do asyncio: cada pergunta recebe um
+    número (new_ticket(), na ordem em que as perguntas foram feitas) e
+    wait(ticket) só retorna quando todos os números anteriores já chamaram
+    release().
+    Usado para que perguntas com histórico cheguem ao LLM na ordem em que
+    foram gravadas, mesmo transcritas em paralelo.
+    Todos os métodos são chamados na thread do loop (sem locks).
+    """
+    def __init__(self):
+        self.issued = 0
+        self.next_turn = 0
+        self.released = set()
+        # ticket -> futures esperando a vez dele
+        self.waiters = {}
+
+    def new_ticket(self):
+        ticket = self.issued
+        self.issued += 1
+        return ticket
+
+    async def wait(self, ticket):
+        if self.next_turn >= ticket:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(ticket, []).append(future)
+        await future
+
+    def release(self, ticket):
+        """
+        Libera a vez do ticket (pode ser chamado mais de uma vez, e antes
+        da vez chegar, p. ex. quando a pergunta falha na transcrição).
+        """
+        if ticket < self.next_turn:
+            return
+        self.released.add(ticket)
+        while self.next_turn in self.released:
+            self.released.discard(self.next_turn)
+            self.next_turn += 1
+        for waiting in [t for t in self.waiters if t <= self.next_turn]:
+            for future in self.waiters.pop(waiting):
+                if not future.done():
+                    future.set_result(None)
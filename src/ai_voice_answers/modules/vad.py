@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+def frame_features(audio, samplerate, frame_ms=20.0):
+    """
+    Energia (RMS entre 0 e 1) e taxa de cruzamentos por zero de cada quadro
+    de frame_ms, calculadas de uma vez (reshape em quadros).
+    Retorna (energy, zcr, frame_len).
+    """
+    frame_len = max(1, int(samplerate * frame_ms / 1000.0))
+    # primeiro canal (sem reshape: um array vazio não tem formato inferível)
+    mono = audio if audio.ndim == 1 else audio[:, 0]
+    n_frames = mono.shape[0] // frame_len
+    frames = mono[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+    if audio.dtype == np.int16:
+        frames /= 32768.0
+
+    energy = np.sqrt(np.mean(np.square(frames), axis=1))
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy, zcr, frame_len
+
+def speech_frames(energy, zcr, energy_threshold=0.01, zcr_threshold=0.25):
+    """
+    Quadros com fala: energia acima do limiar (adaptado ao ruído de fundo),
+    ou energia moderada com muitos cruzamentos por zero (consoantes surdas
+    como "s" e "f", que têm pouca energia).
+    """
+    noise_floor = np.percentile(energy, 10) if energy.size else 0.0
+    threshold = max(energy_threshold, 3.0 * noise_floor)
+    return (energy > threshold) | ((energy > threshold / 3.0) & (zcr > zcr_threshold))
+
+def trim_silence(   audio,
+                    samplerate,
+                    energy_threshold=0.01,
+                    zcr_threshold=0.25,
+                    frame_ms=20.0,
+                    padding_ms=250.0,
+                    max_pause_ms=800.0):
+    """
+    Remove o silêncio do início e do fim (mantendo padding_ms em volta da fala)
+    e encurta as pausas internas para no máximo max_pause_ms.
+    Retorna (audio_cortado, stats).
+    Uma gravação vazia ou menor que um quadro não tem fala.
+    """
+    frame_len = max(1, int(samplerate * frame_ms / 1000.0))
+    if audio.shape[0] < frame_len:
+        seconds = audio.shape[0] / float(samplerate)
+        stats = {
+            "seconds_in": seconds,
+            "seconds_out": 0.0,
+            "removed_seconds": seconds,
+            "removed_bytes": audio.nbytes
+        }
+        return audio[:0], stats
+
+    energy, zcr, frame_len = frame_features(audio, samplerate, frame_ms)
+    speech = speech_frames(energy, zcr, energy_threshold, zcr_threshold)
+    n_frames = speech.size
+
+    if not speech.any():
+        keep = np.zeros(n_frames, dtype=bool)
+    else:
+        # margem em volta da fala (dilatação da máscara)
+        pad = int(padding_ms / frame_ms)
+        keep = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+
+        # pausas internas: a margem dos dois lados já conta como pausa, então
+        # de cada trecho de silêncio interno ficam só os primeiros quadros
+        first, last = np.flatnonzero(keep)[[0, -1]]
+        changes = np.flatnonzero(np.diff(keep.astype(np.int8))) + 1
+        run_starts = np.concatenate([[0], changes])
+        is_start = np.zeros(n_frames, dtype=np.int64)
+        is_start[changes] = 1
+        run_id = np.cumsum(is_start)
+        index = np.arange(n_frames)
+        pos_in_run = index - run_starts[run_id]
+        internal = (index > first) & (index < last)
+        max_gap = max(0, int((max_pause_ms - 2 * padding_ms) / frame_ms))
+        keep |= internal & (pos_in_run < max_gap)
+
+    # amostras que sobram depois do último quadro completo seguem o último quadro
+    sample_keep = np.repeat(keep, frame_len)
+    tail = audio.shape[0] - sample_keep.size
+    if tail > 0:
+        sample_keep = np.concatenate([sample_keep, np.full(tail, bool(keep[-1]) if n_frames else False)])
+
+    trimmed = audio[sample_keep]
+    removed = audio.shape[0] - trimmed.shape[0]
+    stats = {
+        "seconds_in": audio.shape[0] / float(samplerate),
+        "seconds_out": trimmed.shape[0] / float(samplerate),
+        "removed_seconds": removed / float(samplerate),
+        "removed_bytes": removed * audio.itemsize * (audio.size // max(1, audio.shape[0]))
+    }
+    return trimmed, stats
+
+class EndpointDetector:
+    """
+    Detecta início e fim de fala bloco a bloco (modo contínuo).
+    feed() recebe o RMS de cada bloco gravado e retorna:
+    - "start": houve fala por pelo menos min_speech_ms;
+    - "end": depois da fala, silêncio por silence_ms (fim da pergunta);
+    - None: nada mudou.
+    O limiar se adapta ao ruído de fundo (média móvel do RMS fora da fala) e
+    pode ser multiplicado por threshold_factor (p. ex. durante a reprodução
+    da resposta, para não reagir ao eco do alto-falante).
+    """
+    def __init__(self, samplerate, energy_threshold=0.02, silence_ms=900.0, min_speech_ms=300.0):
+        self.samplerate = samplerate
+        self.energy_threshold = energy_threshold
+        self.silence_samples_max = int(samplerate * silence_ms / 1000.0)
+        self.min_speech_samples = int(samplerate * min_speech_ms / 1000.0)
+        self.noise = 0.0
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.speech_samples = 0
+        self.silence_samples = 0
+
+    def feed(self, rms, n_samples, threshold_factor=1.0):
+        threshold = max(self.energy_threshold, 3.0 * self.noise) * threshold_factor
+        is_speech = rms > threshold
+
+        if not self.in_speech:
+            if is_speech:
+                self.speech_samples += n_samples
+                if self.speech_samples >= self.min_speech_samples:
+                    self.in_speech = True
+                    self.silence_samples = 0
+                    return "start"
+            else:
+                self.speech_samples = 0
+                self.noise = 0.95 * self.noise + 0.05 * rms
+            return None
+
+        self.speech_samples += n_samples
+        if is_speech:
+            self.silence_samples = 0
+        else:
+            self.silence_samples += n_samples
+            if self.silence_samples >= self.silence_samples_max:
+                self.in_speech = False
+                return "end"
+        return None
@@ -0,0 +1,50 @@
+from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QVBoxLayout
+from PyQt5.QtCore import QTimer
+
+from ai_voice_answers.modules.history_view import HistoryModel, HistoryView
+
+class ArchiveWindow(QDialog):
+    """
+    Arquivo das sessões (session_store): os turnos mais recentes primeiro,
+    carregados por páginas conforme a rolagem, e busca por palavras.
+    """
+    def __init__(self, store, title="Session archive", page_size=100, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.page_size = page_size
+        self.setWindowTitle(title)
+        self.resize(600, 700)
+
+        layout = QVBoxLayout(self)
+
+        # Search
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search questions and answers")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start())
+        layout.addWidget(self.search_edit)
+
+        # busca só depois de uma pausa na digitação
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.apply_search)
+
+        # History
+        self.history_list = HistoryView()
+        layout.addWidget(self.history_list)
+
+        # Count
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
+
+        self.apply_search()
+
+    def apply_search(self):
+        model = HistoryModel(self.history_list, pager=self.store.pager(self.search_edit.text()), page_size=self.page_size)
+        model.fetchMore()
+        old = self.history_list.model()
+        self.history_list.setModel(model)
+        if old is not None:
+            old.deleteLater()
+        self.count_label.setText("{} turns in the archive".format(self.store.count()))
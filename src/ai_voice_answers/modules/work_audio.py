@@ -1,44 +1,175 @@
 #!/usr/bin/python3
 
 import os
-import io
-from pydub import AudioSegment
-from pydub.playback import play
+import shutil
 import tempfile
+import threading
+import gtts.tts
 from gtts import gTTS
 
-def play_audio_file(audio_path, fator):
+from ai_voice_answers.modules.disk_cache import DiskCache, cache_dir, make_key
+
+from ai_voice_answers.modules.playback import get_playback_engine
+from ai_voice_answers.modules.http_pool import get_requests_session, get_openai_client
+
+def play_audio_file(audio_path, fator, generation=None):
     if os.path.exists(audio_path):
-        # Carregar o arquivo de áudio
-        audio = AudioSegment.from_file(audio_path)
-        
-        # Ajustar a velocidade sem alterar o pitch
-        if fator != 1.0:
-            audio_modificado = audio.speedup(playback_speed=fator)
-        else:
-            audio_modificado = audio
-        
-        # Exportar o áudio para um buffer em memória
-        audio_buffer = io.BytesIO()
-        audio_modificado.export(audio_buffer, format="wav")
-        
-        # Reposicionar o cursor no início do buffer
-        audio_buffer.seek(0)
-        
-        # Reproduzir o áudio modificado diretamente do buffer
-        play(AudioSegment.from_wav(audio_buffer))
-
-
-
-def text_to_audio_file(text, language, dir_path):
-    tts = gTTS(text=text, lang=language)
+        # Decodifica e ajusta a velocidade (sem alterar o pitch) só na
+        # primeira vez; depois toca direto do cache do PlaybackEngine
+        return get_playback_engine().play_file(audio_path, fator, generation)
+    return False
+
+
+
+TTS_BACKEND = "gtts"
+
+class SharedSession:
+    """
+    Context manager que devolve a requests.Session compartilhada: o
+    `with requests.Session() as s` do gTTS não a fecha.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def __enter__(self):
+        return self.session
+
+    def __exit__(self, *exc):
+        return False
+
+class PooledRequests:
+    """
+    O módulo requests visto por gtts.tts: só a fábrica Session muda, e só
+    dentro de PooledgTTS.stream() (nas outras chamadas, e em outras
+    threads, é a requests.Session de sempre).
+    """
+    def __init__(self, module):
+        self.module = module
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+    def Session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            return self.module.Session()
+        return SharedSession(session)
+
+if not isinstance(gtts.tts.requests, PooledRequests):
+    gtts.tts.requests = PooledRequests(gtts.tts.requests)
+
+class PooledgTTS(gTTS):
+    """
+    gTTS que envia as requisições pela requests.Session compartilhada
+    (http_pool), em vez de abrir uma sessão (e uma conexão TLS) por frase.
+    A requisição e a leitura da resposta continuam sendo as de gTTS.stream();
+    se uma versão do gTTS deixar de usar requests.Session(), só o pool se
+    perde.
+    """
+    def stream(self):
+        local = gtts.tts.requests.local
+        previous = getattr(local, "session", None)
+        local.session = get_requests_session()
+        try:
+            yield from super().stream()
+        finally:
+            local.session = previous
+
+_tts_cache = None
+
+def get_tts_cache(max_mb=200):
+    """
+    Cache de TTS compartilhado (em ~/.cache/ai_voice_answers/tts).
+    """
+    global _tts_cache
+    if _tts_cache is None:
+        _tts_cache = DiskCache(cache_dir("tts"), suffix=".mp3")
+    _tts_cache.max_bytes = int(max_mb * 1024 * 1024)
+    return _tts_cache
+
+def link_or_copy(src, dst):
+    """
+    Hard link quando possível (o arquivo temporário pode ser apagado sem
+    afetar o cache), senão cópia. Retorna False se src sumiu (removido por
+    outra instância).
+    """
+    try:
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            shutil.copyfile(src, dst)
+        return True
+    except FileNotFoundError:
+        return False
+
+def tts_backend_id(system_data):
+    """
+    Identifica o backend (e modelo/voz) na chave do cache de TTS.
+    """
+    if system_data is None or system_data.get("tts_backend", TTS_BACKEND) == "gtts":
+        return TTS_BACKEND
+    return "openai:{}:{}:{}".format(system_data["base_url"],
+                                    system_data["model_tts"],
+                                    system_data["tts_voice"])
+
+def openai_speech(text, system_data, path):
+    """
+    TTS pelo endpoint /audio/speech compatível com OpenAI (DeepInfra ou
+    benchmarks.mock_server), pelo cliente compartilhado.
+    """
+    client = get_openai_client(system_data["base_url"], system_data["api_key"])
+    response = client.audio.speech.create(  model=system_data["model_tts"],
+                                            voice=system_data["tts_voice"],
+                                            input=text,
+                                            response_format="mp3")
+    with open(path, "wb") as f:
+        f.write(response.content)
+
+def text_to_audio_file(text, language, dir_path, cache=None, system_data=None):
+    """
+    system_data (config.gpt.json) escolhe o backend em "tts_backend":
+    "gtts" (padrão) ou "openai".
+    """
     tmp_filename = tempfile.NamedTemporaryFile(
         suffix=".mp3",
         delete=False,
         dir=dir_path
     )
-    tts.save(tmp_filename.name)
-    return tmp_filename.name;
+    tmp_filename.close()
 
+    if cache is not None:
+        key = make_key(tts_backend_id(system_data), language, text)
+        cached_path = cache.get_path(key)
+        if cached_path is not None and link_or_copy(cached_path, tmp_filename.name):
+            return tmp_filename.name
 
+    if tts_backend_id(system_data) == TTS_BACKEND:
+        tts = PooledgTTS(text=text, lang=language)
+        tts.save(tmp_filename.name)
+    else:
+        openai_speech(text, system_data, tmp_filename.name)
 
+    if cache is not None:
+        cache.put_file(key, tmp_filename.name)
+    return tmp_filename.name
+
+def concat_audio_files(audio_paths, dir_path):
+    """
+    Junta vários arquivos mp3 em um só.
+    Os quadros MPEG podem ser concatenados byte a byte, sem recodificar.
+    """
+    tmp_filename = tempfile.NamedTemporaryFile(
+        suffix=".mp3",
+        delete=False,
+        dir=dir_path
+    )
+    with tmp_filename as fout:
+        for path in audio_paths:
+            with open(path, "rb") as fin:
+                fout.write(fin.read())
+    return tmp_filename.name
@@ -10,34 +10,60 @@ import atexit
 import signal
 import shutil
 import tempfile
+import threading
 import subprocess
-import numpy as np
-import sounddevice as sd
-
-from pydub import AudioSegment
+import json
+import importlib
+from collections import deque, OrderedDict
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QFrame, QTextEdit, QFileDialog, 
-    QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar,
-    QSystemTrayIcon, QMenu, QAction, QSizePolicy, QSpacerItem, QCheckBox,
-    QListWidget, QListWidgetItem
+    QPushButton, QVBoxLayout, QHBoxLayout, QProgressBar,
+    QSystemTrayIcon, QMenu, QAction, QSizePolicy, QSpacerItem, QCheckBox
 )
-from PyQt5.QtGui  import QIcon, QDesktopServices, QColor
-from PyQt5.QtCore import Qt, QUrl, QThread, pyqtSignal, QSize
+from PyQt5.QtGui  import QIcon, QDesktopServices
+from PyQt5.QtCore import Qt, QUrl, QObject, pyqtSignal, QTimer
 
 import ai_voice_answers.about             as about
 import ai_voice_answers.modules.configure as configure 
 
 from ai_voice_answers.modules.resources import resource_path
 from ai_voice_answers.modules.wabout    import show_about_window
+from ai_voice_answers.modules.history_view import HistoryView
 from ai_voice_answers.desktop import create_desktop_file
 from ai_voice_answers.desktop import create_desktop_directory
 from ai_voice_answers.desktop import create_desktop_menu
-
-from deep_consultation.chat_deepinfra    import ChatDeepInfra
-from ai_voice_answers.modules.consult    import transcription_in_depth
-from ai_voice_answers.modules.work_audio import text_to_audio_file
-from ai_voice_answers.modules.work_audio import play_audio_file
+from ai_voice_answers.desktop import update_desktop_database_async
+from ai_voice_answers.desktop import load_stamp, save_stamp
+
+from ai_voice_answers.modules              import telemetry
+
+# Módulos pesados (áudio, rede, LLM): importados só quando usados, ou em
+# segundo plano por warm_up_imports() depois que o ícone da bandeja aparece.
+HEAVY_MODULES = [
+    "numpy",
+    "sounddevice",
+    "deep_consultation.chat_deepinfra",
+    "ai_voice_answers.modules.capture_buffer",
+    "ai_voice_answers.modules.encoding",
+    "ai_voice_answers.modules.vad",
+    "ai_voice_answers.modules.http_pool",
+    "ai_voice_answers.modules.consult",
+    "ai_voice_answers.modules.incremental",
+    "ai_voice_answers.modules.playback",
+    "ai_voice_answers.modules.work_audio",
+    "ai_voice_answers.modules.answer_cache",
+]
+
+def warm_up_imports():
+    t0 = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # o erro aparece de novo (e com contexto) quando o módulo for usado
+            print("Warm-up: could not import", name, "-", e)
+    return time.perf_counter() - t0
 
 # ---------- Path to config file ----------
 CONFIG_PATH = os.path.join( os.path.expanduser("~"),
@@ -48,6 +74,8 @@ CONFIG_PATH = os.path.join( os.path.expanduser("~"),
 DEFAULT_CONTENT={   
     "menubar_show_recorder": "Show window recorder",
     "menubar_hide_recorder": "Hide window recorder",
+    "menubar_continuous": "🔁 Continuous conversation",
+    "menubar_archive": "🗂 Session archive",
     "menubar_configure": "✨ Configure window",
     "menubar_configure_gpt": "✨ Configure LLM",
     "menubar_about": "🌟 About",
@@ -62,6 +90,7 @@ DEFAULT_CONTENT={
     "window_success_saving": "Success saving audio",
     "window_error_saving": "Error saving audio",
     "window_done": "Done",
+    "window_error_playing": "🔊 Error playing audio",
     "window_save_as": "Save as",
     "window_save_as_default": "resposta.mp3",
     "window_discard_audio": "Discard audio",
@@ -69,6 +98,7 @@ DEFAULT_CONTENT={
     "window_audio_record": "Audio captured",
     "window_recording": "🎙️ Recording...",
     "window_recording_ended": "⏹️ Recording ended...",
+    "window_listening": "👂 Listening...",
     "window_use_history": "Use history",
     "window_use_history_tooltip": "Use history i chat list",
     "window_button_record": "Record",
@@ -96,9 +126,8 @@ DEFAULT_CONTENT={
     "window_height": 600
 }
 
-configure.verify_default_config(CONFIG_PATH,default_content=DEFAULT_CONTENT)
-
-CONFIG=configure.load_config(CONFIG_PATH)
+# preenchido por init_config()
+CONFIG={}
 
 # ---------- Path to config gpt file ----------
 CONFIG_GPT_PATH = os.path.join( os.path.expanduser("~"),
@@ -113,10 +142,60 @@ DEFAULT_GPT_CONTENT={
     "model_llm": "deepseek-ai/DeepSeek-V3.2",
     "model_transcript": "mistralai/Voxtral-Mini-3B-2507",
     "language": "pt",
-    "play_factor": 1.5
+    "play_factor": 1.5,
+    "stream_response": False,
+    "stream_min_sentence_chars": 40,
+    "incremental_transcription": False,
+    "incremental_pause_ms": 600,
+    "incremental_min_chunk_s": 4.0,
+    "incremental_silence_rms": 0.01,
+    "upload_codec": "wav",
+    "upload_bitrate": "32k",
+    "tts_backend": "gtts",
+    "model_tts": "hexgrad/Kokoro-82M",
+    "tts_voice": "af_bella",
+    "tts_cache": True,
+    "tts_cache_max_mb": 200,
+    "transcription_cache": True,
+    "transcription_cache_bypass": False,
+    "transcription_cache_max_mb": 20,
+    "answer_cache": False,
+    "answer_cache_similarity": 0.92,
+    "answer_cache_max_entries": 2000,
+    "vad_trim": True,
+    "vad_energy_threshold": 0.01,
+    "vad_zcr_threshold": 0.25,
+    "vad_padding_ms": 250,
+    "vad_max_pause_ms": 800,
+    "continuous_silence_ms": 900,
+    "continuous_min_speech_ms": 300,
+    "continuous_energy_threshold": 0.02,
+    "continuous_listen_during_playback": False,
+    "continuous_echo_factor": 4.0,
+    "max_parallel_jobs": 2,
+    "context_max_tokens": 4000,
+    "context_keep_turns": 2,
+    "context_summarize": True,
+    "context_summary_tokens": 300,
+    "session_store": True,
+    "session_db": "",
+    "session_keep_audio": False,
+    "telemetry": True,
+    "telemetry_log": "",
+    "metrics_port": 0
 }
 
-configure.verify_default_config(CONFIG_GPT_PATH,default_content=DEFAULT_GPT_CONTENT)
+# Relê o arquivo só quando ele muda
+CONFIG_GPT = configure.ConfigManager(CONFIG_GPT_PATH, DEFAULT_GPT_CONTENT)
+
+def init_config():
+    """
+    Cria os arquivos de configuração (se não existirem) e carrega CONFIG.
+    Chamado por main(), não na importação do módulo.
+    """
+    configure.verify_default_config(CONFIG_PATH,default_content=DEFAULT_CONTENT)
+    CONFIG.update(configure.load_config(CONFIG_PATH, DEFAULT_CONTENT))
+    configure.verify_default_config(CONFIG_GPT_PATH,default_content=DEFAULT_GPT_CONTENT)
 
 ################################################################################
 
@@ -130,36 +209,6 @@ def open_file_in_text_editor(filepath):
 
 ################################################################################
 
-class ResizableListWidget(QListWidget):
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self.update_item_sizes()
-
-    def update_item_sizes(self):
-        for i in range(self.count()):
-            item = self.item(i)
-            widget = self.itemWidget(item)
-            if widget:
-                # atualiza largura do widget para forçar recalculo do boundingRect
-                widget.setFixedWidth(self.viewport().width())
-                item.setSizeHint(widget.sizeHint())
-
-class WordWrapLabel(QLabel):
-    def __init__(self, text="", parent=None):
-        super().__init__(text, parent)
-        self.setWordWrap(True)
-        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-        self.setMargin(5)
-        self._list_item = None
-
-        self.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
-
-    def sizeHint(self):
-        w = self.width() if self.width() > 0 else 100
-        fm = self.fontMetrics()
-        rect = fm.boundingRect(0, 0, w, 10000, Qt.TextWordWrap, self.text())
-        return QSize(rect.width(), rect.height() + 10)
-                    
 # =========================
 # AUDIO RECORDER
 # =========================
@@ -167,23 +216,111 @@ class AudioRecorder:
     def __init__(self, samplerate=16000, channels=1):
         self.samplerate = samplerate
         self.channels = channels
-        self.frames = []
+        self.buffer = None
         self.recording = False
         self.stream = None
+        
+        # corte em trechos nas pausas (transcrição incremental)
+        self.chunk_callback = None
+        self.pause_ms = 600
+        self.min_chunk_s = 4.0
+        self.silence_rms = 0.01
+
+        # detecção de fim de fala (modo contínuo)
+        self.endpointer = None
+        self.echo_guard = False
+        self.echo_factor = 4.0
+        self.preroll_s = 0.3
+        self.events = deque()
+
+    def set_chunking(self, chunk_callback, pause_ms=600, min_chunk_s=4.0, silence_rms=0.01):
+        """
+        Se chunk_callback não for None, a cada pausa de pause_ms (depois de
+        pelo menos min_chunk_s de áudio) o áudio gravado desde o último
+        corte é entregue a chunk_callback (view int16, sem cópia).
+        """
+        self.chunk_callback = chunk_callback
+        self.pause_ms = pause_ms
+        self.min_chunk_s = min_chunk_s
+        self.silence_rms = silence_rms
+
+    def set_endpointing(self, endpointer, echo_factor=4.0, preroll_s=0.3):
+        """
+        Modo contínuo: se endpointer (vad.EndpointDetector) não for None, o
+        stream fica aberto e cada fala completa é colocada em self.events
+        como ("utterance", audio); o início de cada fala gera ("speech_start", None).
+        Enquanto echo_guard for True (resposta tocando) o limiar é
+        multiplicado por echo_factor (float("inf") ignora a entrada).
+        """
+        self.endpointer = endpointer
+        self.echo_factor = echo_factor
+        self.preroll_s = preroll_s
+        self.events.clear()
 
     def _callback(self, indata, frames, time_, status):
         if self.recording:
-            self.frames.append(indata.copy())
+            self.buffer.write(indata)
+            if self.chunk_callback is not None:
+                self._detect_pause(indata, frames)
+            if self.endpointer is not None:
+                self._detect_endpoint(indata, frames)
+
+    def _detect_endpoint(self, indata, frames):
+        from ai_voice_answers.modules.capture_buffer import CaptureBuffer
+
+        factor = self.echo_factor if self.echo_guard else 1.0
+        event = self.endpointer.feed(self.buffer.rms(indata), frames, factor)
+        preroll = int(self.preroll_s * self.samplerate)
+
+        if event == "start":
+            self.utterance_start = max(0, self.buffer.length - self.endpointer.speech_samples - preroll)
+            self.events.append(("speech_start", None))
+        elif event == "end":
+            # mantém um pouco do silêncio final, sem chegar ao fim do buffer
+            end = self.buffer.length - self.endpointer.silence_samples + preroll
+            self.events.append(("utterance", self.buffer.view(self.utterance_start, min(end, self.buffer.length))))
+            # a view continua válida: a próxima fala vai para outro buffer
+            self.buffer = CaptureBuffer(self.samplerate, self.channels)
+        elif not self.endpointer.in_speech and self.buffer.length > 30 * self.samplerate:
+            # só silêncio: descarta, mantendo o pré-roll para a próxima fala
+            tail = self.buffer.view(self.buffer.length - preroll).copy()
+            self.buffer = CaptureBuffer(self.samplerate, self.channels)
+            self.buffer.write(tail)
+
+    def _detect_pause(self, indata, frames):
+        rms = self.buffer.rms(indata)
+        if rms < self.silence_rms:
+            self.silence_samples += frames
+        else:
+            self.silence_samples = 0
+        self.chunk_samples += frames
+        
+        if (self.chunk_samples >= self.min_chunk_s * self.samplerate and 
+            self.silence_samples >= self.pause_ms * self.samplerate / 1000.0):
+            self.chunk_callback(self.buffer.view(self.chunk_start))
+            self.chunk_start = self.buffer.length
+            self.chunk_samples = 0
 
     def start(self):
+        import sounddevice as sd
+        from ai_voice_answers.modules.capture_buffer import CaptureBuffer
+        
         if self.recording:
             return
-        self.frames = []
+        # Novo buffer a cada gravação: a view da gravação anterior
+        # pode continuar em uso (processamento, play)
+        self.buffer = CaptureBuffer(self.samplerate, self.channels)
+        self.utterance_start = 0
+        if self.endpointer is not None:
+            self.endpointer.reset()
+        self.chunk_start = 0
+        self.chunk_samples = 0
+        self.silence_samples = 0
         self.recording = True
         self.stream = sd.InputStream(
             samplerate=self.samplerate,
             channels=self.channels,
-            dtype="float32",
+            dtype="int16",
             callback=self._callback
         )
         self.stream.start()
@@ -198,107 +335,239 @@ class AudioRecorder:
         self.stream = None
         print(CONFIG["window_recording_ended"])
 
-        if not self.frames:
+        # último trecho (o que sobrou depois do último corte)
+        if self.chunk_callback is not None and self.chunk_start < self.buffer.length:
+            self.chunk_callback(self.buffer.view(self.chunk_start))
+            self.chunk_start = self.buffer.length
+
+        stats = self.buffer.stats()
+        print(  "🎙️ {:.1f} s, {:.1f} KiB used / {:.1f} KiB allocated, {} reallocs".format(
+                stats["seconds"], 
+                stats["used_bytes"] / 1024.0, 
+                stats["allocated_bytes"] / 1024.0, 
+                stats["reallocs"]))
+
+        if self.buffer.length == 0:
             return None
 
-        return np.concatenate(self.frames, axis=0)
+        return self.buffer.view()
 
 
 # =========================
-# PROCESSING THREAD
+# JOB QUEUE
 # =========================
-class ProcessingThread(QThread):
+class JobQueue(QObject):
+    """
+    Adaptador Qt do PipelineEngine (modules/engine.py): cada pergunta
+    gravada vira uma tarefa engine.ask() no loop do EngineLoop (até
+    max_parallel_jobs ao mesmo tempo; o usuário pode gravar a pergunta B
+    enquanto a pergunta A ainda está sendo transcrita/respondida).
+    Os eventos do engine chegam como sinais na thread da UI; os resultados,
+    o progresso e os trechos de áudio em streaming são entregues na ordem em
+    que as perguntas foram feitas (só o job mais antigo é "a cabeça").
+    """
     progress = pyqtSignal(int, str)
+    # caminho do trecho e o telemetry.Turn do job (ou None)
+    audio_chunk = pyqtSignal(str, object)
     finished = pyqtSignal(dict)
+    # (job_id, evento, valor), emitido na thread do loop
+    engine_event = pyqtSignal(int, str, object)
 
-    def __init__(self, audio_path, dir_temp, use_history=True, cdi=None, parent=None):
+    def __init__(self, engine, loop, parent=None):
         super().__init__(parent)
-        self.audio_path = audio_path
-        self.dir_temp = dir_temp
-        self.use_history = use_history
-        # Se não veio um cdi, cria novo
-        self.cdi = cdi
-
-    def run(self):
-        # progress
-        self.progress.emit(0,"")
+        self.engine = engine
+        self.loop = loop
+        self.next_id = 0
+        # jobs ainda não entregues, na ordem de chegada
+        self.jobs = OrderedDict()
+        self.engine_event.connect(self._on_engine_event)
+
+    def submit(self, audio, pcm, transcriber=None, use_history=True, conversation=None, turn=None):
+        job_id = self.next_id
+        self.next_id += 1
         
-        config_gpt = configure.load_config(CONFIG_GPT_PATH)
-        
-        if len(config_gpt["api_key"].strip()) == 0:
-            self.progress.emit(0,CONFIG["windows_no_apikey"]+": "+CONFIG_GPT_PATH)
-            self.finished.emit({"error": "no_api_key"})
-            return        
-
-        self.progress.emit(5,CONFIG["windows_loaded_apikey"])
-        print("📝 "+CONFIG["windows_loaded_apikey"])
+        def on_event(name, value=None):
+            self.engine_event.emit(job_id, name, value)
         
-        language = config_gpt["language"]
-        
-        transcription = transcription_in_depth(config_gpt, self.audio_path, language=language)
-        transcription = transcription.strip()
-        
-        # progress
-        self.progress.emit(45,CONFIG["windows_transcription"]+":\n"+transcription)
-        print("📝 "+CONFIG["windows_transcription"]+": " + transcription)
-        
-        if self.cdi is None:
-            self.cdi = ChatDeepInfra(   config_gpt["base_url"], 
-                                        config_gpt["api_key"], 
-                                        config_gpt["model_llm"])
-        
-        # Sempre define o system prompt antes de perguntar
-        SYSTEM_PROMPT = (
-            "You are an expert in many fields. Answer concisely. "
-            "If unsure, admit it. Avoid trivial, redundant, or idle chatter. "
-            "You have no memory but can accept history. Your personality is stoic and spartan."
-        )
-        self.cdi.set_system_prompt(SYSTEM_PROMPT)
-        
-        # Checa se histórico deve ser usado
-        if self.use_history:
-            res = self.cdi.chat(transcription).strip()
+        self.jobs[job_id] = {
+            "future": None,
+            "turn": turn,
+            "result": None,
+            "progress": (0, ""),
+            "chunks": [],
+            "emitted": False,
+            "mute": False
+        }
+        future = self.loop.submit(self.engine.ask(  audio = audio,
+                                                    pcm = pcm,
+                                                    transcriber = transcriber,
+                                                    use_history = use_history,
+                                                    conversation = conversation,
+                                                    turn = turn,
+                                                    on_event = on_event))
+        self.jobs[job_id]["future"] = future
+        future.add_done_callback(lambda f: self.engine_event.emit(job_id, "finished", self._result(f)))
+        return job_id
+
+    @staticmethod
+    def _result(future):
+        if future.cancelled():
+            return {"error": "cancelled", "message": "Cancelled"}
+        if future.exception() is not None:
+            return {"error": "exception", "message": str(future.exception())}
+        return future.result()
+
+    def running(self):
+        return sum(1 for job in self.jobs.values() if not job["future"].done())
+
+    def active(self):
+        return len(self.jobs)
+
+    def head(self):
+        return next(iter(self.jobs), None)
+
+    def _on_engine_event(self, job_id, name, value):
+        if name == "finished":
+            self._on_finished(job_id, value)
+        elif name == "audio_chunk":
+            self._on_chunk(job_id, value)
+        elif name == "started":
+            self._on_progress(job_id, 0, "")
+        elif name == "api_key":
+            self._on_progress(job_id, 5, CONFIG["windows_loaded_apikey"])
+            print("📝 "+CONFIG["windows_loaded_apikey"])
+        elif name == "transcription":
+            self._on_progress(job_id, 45, CONFIG["windows_transcription"]+":\n"+value)
+        elif name == "partial_response":
+            self._on_progress(job_id, 60, value)
+        elif name == "response":
+            self._on_progress(job_id, 90, value)
+        elif name == "done":
+            self._on_progress(job_id, 100, value)
+
+    def _on_progress(self, job_id, value, msg):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job["progress"] = (value, msg)
+        if job_id == self.head():
+            queued = len(self.jobs) - 1
+            self.progress.emit(value, msg if queued == 0 else "[+{}] {}".format(queued, msg))
+
+    def _on_chunk(self, job_id, path):
+        job = self.jobs.get(job_id)
+        if job is None or job["mute"]:
+            return
+        if job_id == self.head():
+            job["emitted"] = True
+            self.audio_chunk.emit(path, job["turn"])
         else:
-            res = self.cdi.ask_once(transcription).strip()
-        
-        # progress
-        self.progress.emit(90,res)
-        print("📝 "+CONFIG["windows_response_obtained"]+": ", res)
-        
-        res_audio_path = text_to_audio_file(res,language, self.dir_temp)
-        
-        # progress
-        self.progress.emit(100,res)
+            job["chunks"].append(path)
+
+    def _on_finished(self, job_id, data):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if data.get("error") == "no_api_key":
+            self._on_progress(job_id, 0, CONFIG["windows_no_apikey"]+": "+CONFIG_GPT_PATH)
+        job["result"] = data
+        self._deliver()
+
+    def _deliver(self):
+        """
+        Entrega, em ordem, os resultados prontos do início da fila.
+        """
+        while self.jobs:
+            job_id = self.head()
+            job = self.jobs[job_id]
+            if job["result"] is None:
+                # a nova cabeça: progresso e áudio que estavam guardados
+                value, msg = job["progress"]
+                self._on_progress(job_id, value, msg)
+                chunks, job["chunks"] = job["chunks"], []
+                for path in chunks:
+                    self._on_chunk(job_id, path)
+                return
+            del self.jobs[job_id]
+            self.finished.emit(job["result"])
+
+    def mute_head(self):
+        """
+        Barge-in: descarta o áudio em streaming que o job atual ainda vai
+        produzir (se o que está tocando é dele).
+        """
+        job_id = self.head()
+        if job_id is not None and self.jobs[job_id]["emitted"]:
+            self.jobs[job_id]["mute"] = True
+            turn = self.jobs[job_id]["turn"]
+            if turn is not None:
+                turn.done("playback")
+
+    def wait_all(self, timeout=None):
+        from concurrent.futures import wait
         
-        out = {
-            "transcription" : transcription.strip(),
-            "transcription_audio_path" : self.audio_path,
-            "response": res.strip(),
-            "response_audio_path": res_audio_path
-        }
-        self.finished.emit(out)
+        futures = [job["future"] for job in self.jobs.values()]
+        if futures:
+            wait(futures, timeout)
 
 # =========================
-# PLAY AUDIO THREAD
+# PLAY AUDIO
 # =========================
-class AudioPlayerThread(QThread):
+class AudioPlayer(QObject):
+    """
+    Adaptador Qt de PipelineEngine.play(): a reprodução roda no engine e
+    finished é emitido (na thread da UI) quando ela termina ou é parada.
+    Se ela falha (sem ffprobe/ffmpeg, erro do PortAudio...), failed é
+    emitido antes, com a mensagem.
+    """
     finished = pyqtSignal()
+    failed = pyqtSignal(str)
 
-    def __init__(self, audio_path, fator=1.0, parent=None):
+    def __init__(self, engine, loop, audio_path, fator=1.0, turn=None, parent=None):
         super().__init__(parent)
+        self.engine = engine
+        self.loop = loop
         self.audio_path = audio_path
         self.fator = fator
-        self._running = True
+        self.turn = turn
+        self.future = None
 
-    def run(self):
-        if self._running:
-            play_audio_file(self.audio_path, self.fator)
+    def start(self):
+        # a geração é pega aqui: um stop() antes de a reprodução começar no loop também vale
+        generation = self.engine.playback_generation()
+        self.future = self.loop.submit(self.engine.play(self.audio_path, self.fator, self.turn, generation))
+        self.future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        # cancelado antes de começar: engine.play() não chegou a marcar o turno
+        if future.cancelled():
+            if self.turn is not None:
+                self.turn.done("playback")
+        elif future.exception() is not None:
+            error = future.exception()
+            msg = "{}: {}: {}".format(CONFIG["window_error_playing"], type(error).__name__, error)
+            print(msg)
+            if self.turn is not None:
+                self.turn.done("playback")
+            self.failed.emit(msg)
         self.finished.emit()
 
-    def stop(self):
-        self._running = False
-        # se play_audio_file suportar stop → chamar aqui
+    def isRunning(self):
+        return self.future is not None and not self.future.done()
 
+    def stop(self):
+        """
+        Interrompe a reprodução em no máximo um bloco de áudio.
+        """
+        if self.future is not None:
+            self.future.cancel()
+        self.engine.stop_playback()
+
+    def wait(self, timeout=None):
+        from concurrent.futures import wait
+        
+        if self.future is not None:
+            wait([self.future], timeout)
 # =========================
 # MAIN WINDOW
 # =========================
@@ -306,11 +575,19 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        self.cdi = None
-
+        from ai_voice_answers.modules.engine import PipelineEngine, EngineLoop, Conversation
+        
         self.temp_dir = tempfile.mkdtemp(prefix=about.__package__+"_")
         atexit.register(self.cleanup_temp_dir)
         
+        # pipeline (asyncio, sem Qt) num loop em outra thread; a janela só adapta os eventos
+        self.loop = EngineLoop()
+        self.engine = PipelineEngine(   CONFIG_GPT.get, 
+                                        self.temp_dir, 
+                                        limits={"jobs": CONFIG_GPT.get()["max_parallel_jobs"]})
+        # histórico (mostrado e enviado ao LLM) e sessão do arquivo da conversa atual
+        self.conversation = Conversation()
+        
         self.setWindowTitle(about.__program_name__)
         self.setGeometry(200, 200, CONFIG["window_width"], CONFIG["window_height"])
         
@@ -321,8 +598,33 @@ class MainWindow(QMainWindow):
 
         self.recorder = AudioRecorder()
         self.audio_data = None
+        self.audio_upload = None
         self.audio_path = None
         self.audio_res_path = None
+        self.audio_spans = []
+        # início da gravação atual (perf_counter), para o span "capture"
+        self.record_t0 = None
+        self.play_queue = []
+        self.transcriber = None
+        
+        # modo contínuo (mãos livres)
+        self.continuous = False
+        self.continuous_timer = QTimer(self)
+        self.continuous_timer.timeout.connect(self.poll_continuous)
+        
+        # perguntas em processamento (várias ao mesmo tempo, entregues em ordem)
+        self.jobs = JobQueue(self.engine, self.loop, parent=self)
+        self.jobs.progress.connect(self.progress_callback)
+        self.jobs.audio_chunk.connect(self.enqueue_res_audio)
+        self.jobs.finished.connect(self.processing_done)
+        
+        # endpoint Prometheus opcional (só localhost)
+        config_gpt = CONFIG_GPT.get()
+        if config_gpt["telemetry"] and config_gpt["metrics_port"]:
+            try:
+                telemetry.get_turn_recorder(config_gpt["telemetry_log"] or None).serve_metrics(config_gpt["metrics_port"])
+            except OSError as e:
+                print("Error starting the metrics endpoint:", e)
 
         self._build_ui()
 
@@ -410,8 +712,7 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.status_text)
 
         # 
-        self.history_list = ResizableListWidget()
-        self.history_list.setSelectionMode(QListWidget.SingleSelection)
+        self.history_list = HistoryView()
         self.history_list.setToolTip(CONFIG["window_history_view_tooltip"])
         self.history_list.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         layout.addWidget(self.history_list)
@@ -450,15 +751,35 @@ class MainWindow(QMainWindow):
         central.setLayout(layout)
 
     def clear_history_action(self):
-        if self.cdi:
-            self.cdi.clear_history()
-        self.history_list.clear()
+        self.conversation.clear()
+        # a próxima pergunta começa outra sessão no arquivo
+        self.conversation.session = None
+        self.history_list.model().clear()
         self.status_text.setText(CONFIG["window_status_text"])
     
     # -------------------------
     # RECORD CONTROL
     # -------------------------
     def start_recording(self):
+        from ai_voice_answers.modules.incremental import IncrementalTranscriber
+        
+        # barge-in: gravar corta a resposta que estiver tocando
+        self.stop_playback()
+        self.cancel_transcriber()
+        
+        config_gpt = CONFIG_GPT.get()
+        if config_gpt["incremental_transcription"] and len(config_gpt["api_key"].strip()) > 0:
+            self.transcriber = IncrementalTranscriber(  config_gpt, 
+                                                        self.recorder.samplerate, 
+                                                        language=config_gpt["language"])
+            self.recorder.set_chunking( self.transcriber.add_chunk,
+                                        pause_ms=config_gpt["incremental_pause_ms"],
+                                        min_chunk_s=config_gpt["incremental_min_chunk_s"],
+                                        silence_rms=config_gpt["incremental_silence_rms"])
+        else:
+            self.recorder.set_chunking(None)
+        
+        self.record_t0 = time.perf_counter()
         self.recorder.start()
         self.status_text.setText(CONFIG["window_recording"])
         self.record_btn.setEnabled(False)
@@ -466,51 +787,185 @@ class MainWindow(QMainWindow):
         self.stop_proc_btn.setEnabled(True)
 
     def stop_recording(self):
+        t0 = self.record_t0 if self.record_t0 is not None else time.perf_counter()
+        self.record_t0 = None
         audio = self.recorder.stop()
+        # tempos de gravação (do início da gravação até o fim do stop)/VAD/
+        # codificação, copiados para o turno em process_audio
+        self.audio_spans = [("capture", time.perf_counter() - t0)]
         self.stop_btn.setEnabled(False)
         self.stop_proc_btn.setEnabled(False)
         self.record_btn.setEnabled(True)
 
+        if audio is not None:
+            audio = self.trim_input_audio(audio)
+
         if audio is not None:
             self.audio_data = audio
-            self.audio_path = self.save_input_audio_mp3(audio)
+            self.audio_upload = self.encode_input_audio(audio)
+            # o arquivo só é escrito se o usuário pedir para ouvir a gravação
+            self.audio_path = None
             self.status_text.setText(CONFIG["window_audio_record"])
             self.process_btn.setEnabled(True)
             self.play_btn.setEnabled(True)
             self.discard_btn.setEnabled(True)
         else:
+            self.cancel_transcriber()
             self.status_text.setText(CONFIG["window_no_audio_record"])
 
+    def trim_input_audio(self, audio_data):
+        """
+        Corta o silêncio do início/fim e encurta as pausas longas (VAD)
+        antes de codificar. Retorna None se não sobrou fala.
+        """
+        from ai_voice_answers.modules.vad import trim_silence
+        
+        config_gpt = CONFIG_GPT.get()
+        if not config_gpt["vad_trim"]:
+            return audio_data
+        
+        t0 = time.perf_counter()
+        trimmed, stats = trim_silence(  audio_data, 
+                                        self.recorder.samplerate,
+                                        energy_threshold=config_gpt["vad_energy_threshold"],
+                                        zcr_threshold=config_gpt["vad_zcr_threshold"],
+                                        padding_ms=config_gpt["vad_padding_ms"],
+                                        max_pause_ms=config_gpt["vad_max_pause_ms"])
+        self.audio_spans.append(("vad", time.perf_counter() - t0))
+        msg = "VAD: {:.1f} s -> {:.1f} s ({:.1f} s, {:.1f} KiB removed)".format(
+                stats["seconds_in"], stats["seconds_out"], 
+                stats["removed_seconds"], stats["removed_bytes"] / 1024.0)
+        print("🎙️ "+msg)
+        self.statusBar().showMessage(msg, 4000)
+        
+        if trimmed.shape[0] == 0:
+            return None
+        return trimmed
+
+    # -------------------------
+    # CONTINUOUS MODE
+    # -------------------------
+    def set_continuous(self, enabled):
+        """
+        Modo mãos livres: o microfone fica aberto, cada fala termina depois
+        de continuous_silence_ms de silêncio e é enviada na hora.
+        """
+        from ai_voice_answers.modules.vad import EndpointDetector
+        
+        if enabled == self.continuous:
+            return
+        
+        if self.recorder.recording:
+            self.recorder.stop()
+            self.record_t0 = None
+        self.cancel_transcriber()
+        
+        if enabled:
+            config_gpt = CONFIG_GPT.get()
+            endpointer = EndpointDetector(  self.recorder.samplerate,
+                                            energy_threshold=config_gpt["continuous_energy_threshold"],
+                                            silence_ms=config_gpt["continuous_silence_ms"],
+                                            min_speech_ms=config_gpt["continuous_min_speech_ms"])
+            if config_gpt["continuous_listen_during_playback"]:
+                echo_factor = config_gpt["continuous_echo_factor"]
+            else:
+                echo_factor = float("inf")
+            
+            self.recorder.set_chunking(None)
+            self.recorder.set_endpointing(endpointer, echo_factor=echo_factor)
+            self.recorder.start()
+            self.continuous_timer.start(50)
+            self.status_text.setText(CONFIG["window_listening"])
+        else:
+            self.continuous_timer.stop()
+            self.recorder.set_endpointing(None)
+            self.status_text.setText(CONFIG["window_status_text"])
+        
+        self.continuous = enabled
+        self.record_btn.setEnabled(not enabled)
+        self.stop_btn.setEnabled(False)
+        self.stop_proc_btn.setEnabled(False)
+
+    def is_playing(self):
+        return bool(self.play_queue) or (hasattr(self, "player") and self.player.isRunning())
+
+    def poll_continuous(self):
+        playing = self.is_playing()
+        # supressão de eco: limiar maior (ou entrada ignorada) enquanto a resposta toca
+        self.recorder.echo_guard = playing
+        
+        while self.recorder.events:
+            kind, audio = self.recorder.events.popleft()
+            if kind == "speech_start":
+                if playing:
+                    # barge-in: falar por cima corta a resposta
+                    self.stop_playback()
+                    playing = False
+                self.status_text.setText(CONFIG["window_recording"])
+            elif kind == "utterance":
+                self.dispatch_utterance(audio)
+
+    def dispatch_utterance(self, audio):
+        self.audio_spans = []
+        audio = self.trim_input_audio(audio)
+        if audio is None:
+            self.status_text.setText(CONFIG["window_listening"])
+            return
+        self.process_utterance(audio)
+
+    def process_utterance(self, audio):
+        self.audio_data = audio
+        self.audio_upload = self.encode_input_audio(audio)
+        self.audio_path = None
+        self.play_btn.setEnabled(True)
+        self.discard_btn.setEnabled(True)
+        self.process_audio()
+
     def stop_recording_and_proc(self):
         self.stop_recording()
         self.process_audio()
 
-    def save_input_audio_mp3(self, audio_data):
-        audio_int16 = np.clip(audio_data, -1.0, 1.0)
-        audio_int16 = (audio_int16 * 32767).astype(np.int16)
-
-        audio_segment = AudioSegment(
-            audio_int16.tobytes(),
-            frame_rate=self.recorder.samplerate,
-            sample_width=2,
-            channels=1
-        )
-
+    def encode_input_audio(self, audio_data):
+        from ai_voice_answers.modules.encoding import encode_audio
+        
+        config_gpt = CONFIG_GPT.get()
+        
+        t0 = time.perf_counter()
+        upload = encode_audio(  audio_data, 
+                                self.recorder.samplerate, 
+                                codec=config_gpt["upload_codec"],
+                                bitrate=config_gpt["upload_bitrate"])
+        self.audio_spans.append(("encode", time.perf_counter() - t0))
+        print("🎙️ {}: {:.1f} KiB in {:.0f} ms".format(
+                upload[0], len(upload[1]) / 1024.0, 1000*(time.perf_counter()-t0)))
+        return upload
+
+    def save_input_audio(self):
+        """
+        Escreve o áudio codificado em um arquivo temporário (para tocar).
+        """
+        filename, data = self.audio_upload
         tmp = tempfile.NamedTemporaryFile(
-            suffix=".mp3",
+            suffix=os.path.splitext(filename)[1],
             delete=False,
             dir=self.temp_dir
         )
-        tmp.close()
-
-        audio_segment.export(tmp.name, format="mp3")
+        with tmp:
+            tmp.write(data)
         return tmp.name
+
+    def cancel_transcriber(self):
+        if self.transcriber is not None:
+            self.transcriber.cancel()
+            self.transcriber = None
         
     # -------------------------
     # ACTIONS
     # -------------------------
     def discard_input_audio(self):
+        self.cancel_transcriber()
         self.audio_data = None
+        self.audio_upload = None
         if self.audio_path and os.path.isfile(self.audio_path):
             os.remove(self.audio_path)
         self.audio_path = None
@@ -520,107 +975,119 @@ class MainWindow(QMainWindow):
         self.status_text.setText(CONFIG["window_discard_audio"])
     
     def process_audio(self):
-        if self.audio_data is None or self.audio_path is None:
+        if self.audio_data is None or self.audio_upload is None:
             return
 
         self.process_btn.setEnabled(False)
 
         self.progress.setVisible(True)
-        self.progress_callback(0,"")
+        if self.jobs.active() == 0:
+            self.progress_callback(0,"")
         
-        if self.audio_res_path and os.path.isfile(self.audio_res_path):
-            os.remove(self.audio_res_path)
-
-        self.worker = ProcessingThread(
-            self.audio_path,
-            self.temp_dir,
-            use_history = self.use_history_checkbox.isChecked(),
-            cdi = self.cdi
-        )
+        # max_parallel_jobs pode ter mudado no config.gpt.json
+        self.loop.call(self.engine.set_limit, "jobs", CONFIG_GPT.get()["max_parallel_jobs"])
+        self.ensure_session()
         
-        self.worker.progress.connect(self.progress_callback)
-        self.worker.finished.connect(self.processing_done)
-        self.worker.start()
+        self.jobs.submit(   self.audio_upload,
+                            self.audio_data,
+                            transcriber = self.transcriber,
+                            use_history = self.use_history_checkbox.isChecked(),
+                            conversation = self.conversation,
+                            turn = self.new_turn())
+        # o transcritor pertence agora ao job
+        self.transcriber = None
+        self.statusBar().showMessage("{} question(s) in queue".format(self.jobs.active()), 3000)
+
+    def new_turn(self):
+        """
+        telemetry.Turn para a pergunta atual (None se "telemetry" estiver desligado).
+        """
+        config_gpt = CONFIG_GPT.get()
+        if not config_gpt["telemetry"]:
+            return None
+        turn = telemetry.get_turn_recorder(config_gpt["telemetry_log"] or None).new_turn()
+        for name, duration in self.audio_spans:
+            turn.add_span(name, duration)
+        turn.set("audio_seconds", self.audio_data.shape[0] / float(self.recorder.samplerate))
+        turn.set("upload_codec", config_gpt["upload_codec"])
+        turn.set("upload_bytes", len(self.audio_upload[1]))
+        return turn
+
+    def ensure_session(self):
+        """
+        Sessão do arquivo para a conversa atual (None se "session_store"
+        estiver desligado ou o banco não abrir).
+        """
+        from ai_voice_answers.modules.session_store import get_session_store
+        
+        config_gpt = CONFIG_GPT.get()
+        if not config_gpt["session_store"]:
+            return None
+        if self.conversation.session is None:
+            try:
+                self.conversation.session = get_session_store(config_gpt["session_db"] or None).new_session()
+            except Exception as e:
+                print("Error opening the session store:", e)
+                return None
+        return self.conversation.session
 
     def progress_callback(self, value, msg):
         self.progress.setValue(value)
         self.status_text.setText(msg)
 
     def play_input_audio(self):
-        if os.path.isfile(self.audio_path):
+        if self.audio_path is None and self.audio_upload is not None:
+            self.audio_path = self.save_input_audio()
+        
+        if self.audio_path and os.path.isfile(self.audio_path):
             print(CONFIG["window_paying_audio"]+": "+self.audio_path)
             
-            if hasattr(self, "player") and self.player.isRunning():
-                return  # ou pare a anterior
+            self.stop_playback()
             
-            self.player = AudioPlayerThread(self.audio_path, fator=1.0)
+            self.player = self.new_player(self.audio_path, 1.0)
             self.player.finished.connect(
                 lambda: self.statusBar().showMessage(CONFIG["window_done"], 3000)
             )
             self.player.start()
         else:
-            print(CONFIG["window_file_not_exist"]+": "+self.audio_path)
+            print(CONFIG["window_file_not_exist"]+": "+str(self.audio_path))
     
     def processing_done(self, data):
             
+        # a barra some quando a fila esvazia
+        self.progress.setVisible(self.jobs.active() > 0)
+        
         if not data:
             #self.status_text.setText("Erro no processamento")
-            self.progress.setVisible(False)
             return
 
         if "error" in data and data["error"] == "no_api_key":
             open_file_in_text_editor(CONFIG_GPT_PATH)
-            self.progress.setVisible(False)
             return
         
-        # Atualiza o cdi do MainWindow para manter histórico
-        if hasattr(self.worker, "cdi") and self.worker.cdi is not None:
-            self.cdi = self.worker.cdi
-        
-        # Atualiza visualmente o histórico
-        '''
-        self.history_list.clear()
-        for msg in self.cdi.get_history():
-            item = QListWidgetItem(msg["content"])
-            if msg["role"] == "user":
-                item.setBackground(QColor("#d1e7dd"))  # verde claro
-            else:
-                item.setBackground(QColor("#f8d7da"))  # vermelho claro
-            self.history_list.addItem(item)
-        '''
-        for msg in self.cdi.get_history():
-            label = WordWrapLabel(msg["content"])
-            
-            # cor de fundo
-            if msg["role"] == "user":
-                label.setStyleSheet("background-color: #d1e7dd;")
-            else:
-                label.setStyleSheet("background-color: #f8d7da;")
-            
-            item = QListWidgetItem()
-            item.setSizeHint(label.sizeHint())
-            
-            # linka o label ao item para o resizeEvent funcionar
-            label._list_item = item
-            
-            self.history_list.addItem(item)
-            self.history_list.setItemWidget(item, label)
-            # Depois de adicionar todos, força atualização:
-            self.history_list.update_item_sizes()
+        if "error" in data:
+            self.status_text.setText(data.get("message", data["error"]))
+            self.process_btn.setEnabled(self.audio_upload is not None and self.jobs.active() == 0)
+            return
         
+        # Atualiza visualmente o histórico (só as mensagens novas)
+        self.history_list.model().sync(self.conversation.context.get_history())
         
         # Scroll automático para o final
         self.history_list.scrollToBottom()
         
         self.status_text.setText(data["response"])
         self.audio_res_path = data["response_audio_path"]
-
-        self.progress.setVisible(False)
         
-        self.play_res_audio()
+        # No modo streaming as frases já foram tocadas (ou estão na fila);
+        # senão a resposta toca depois da resposta anterior
+        if not data.get("streamed", False):
+            self.enqueue_res_audio(self.audio_res_path, data.get("turn"))
         
         self.save_as_btn.setEnabled(True)
         self.play_res_btn.setEnabled(True)
+        # permite reprocessar a mesma gravação (a transcrição vem do cache)
+        self.process_btn.setEnabled(self.audio_upload is not None and self.jobs.active() == 0)
             
     def save_as_res_audio(self):
         if not self.audio_res_path or not os.path.isfile(self.audio_res_path):
@@ -653,12 +1120,11 @@ class MainWindow(QMainWindow):
         if os.path.isfile(self.audio_res_path):
             print(CONFIG["window_paying_audio"]+": "+self.audio_res_path)
             
-            if hasattr(self, "player") and self.player.isRunning():
-                return  # ou pare a anterior
+            self.stop_playback()
             
-            config_gpt = configure.load_config(CONFIG_GPT_PATH)
+            config_gpt = CONFIG_GPT.get()
             
-            self.player = AudioPlayerThread(self.audio_res_path, fator=config_gpt["play_factor"])
+            self.player = self.new_player(self.audio_res_path, config_gpt["play_factor"])
             self.player.finished.connect(
                 lambda: self.statusBar().showMessage(CONFIG["window_done"], 3000)
             )
@@ -667,6 +1133,53 @@ class MainWindow(QMainWindow):
             msg = CONFIG["window_file_not_exist"]+": "+self.audio_res_path
             self.statusBar().showMessage(msg, 3000)
             print(msg)
+
+    def new_player(self, audio_path, fator, turn=None):
+        player = AudioPlayer(self.engine, self.loop, audio_path, fator=fator, turn=turn)
+        # o erro chega na thread da UI (sinal), não na thread do loop
+        player.failed.connect(lambda msg: self.statusBar().showMessage(msg, 5000))
+        return player
+
+    def stop_playback(self):
+        """
+        Para o áudio atual, esvazia a fila e ignora os trechos que o job
+        em streaming ainda vai produzir.
+        """
+        if self.is_playing():
+            self.jobs.mute_head()
+        # respostas na fila que não vão mais tocar
+        for _, turn in self.play_queue:
+            if turn is not None:
+                turn.done("playback")
+        self.play_queue = []
+        
+        if hasattr(self, "player") and self.player.isRunning():
+            try:
+                self.player.finished.disconnect()
+            except TypeError:
+                pass
+            self.player.stop()
+            self.player.wait()
+
+    def enqueue_res_audio(self, audio_path, turn=None):
+        """
+        Recebe os trechos de áudio da resposta em streaming e toca em ordem.
+        """
+        self.play_queue.append((audio_path, turn))
+        if not (hasattr(self, "player") and self.player.isRunning()):
+            self.play_next_in_queue()
+
+    def play_next_in_queue(self):
+        if not self.play_queue:
+            self.statusBar().showMessage(CONFIG["window_done"], 3000)
+            return
+        
+        audio_path, turn = self.play_queue.pop(0)
+        config_gpt = CONFIG_GPT.get()
+        
+        self.player = self.new_player(audio_path, config_gpt["play_factor"], turn=turn)
+        self.player.finished.connect(self.play_next_in_queue)
+        self.player.start()
             
     def closeEvent(self, event):
         event.ignore()
@@ -705,6 +1218,22 @@ class TrayIcon(QSystemTrayIcon):
         hide_action.triggered.connect(self.hide_window)
         menu.addAction(hide_action)
 
+        #
+        self.continuous_action = QAction(   QIcon.fromTheme("audio-input-microphone"), 
+                                            CONFIG["menubar_continuous"], 
+                                            self)
+        self.continuous_action.setCheckable(True)
+        self.continuous_action.toggled.connect(self.toggle_continuous)
+        menu.addAction(self.continuous_action)
+
+        #
+        self.archive_action = QAction(  QIcon.fromTheme("document-open-recent"), 
+                                        CONFIG["menubar_archive"], 
+                                        self)
+        self.archive_action.triggered.connect(self.open_archive)
+        menu.addAction(self.archive_action)
+        self.archive_window = None
+
         #
         menu.addSeparator()
 
@@ -748,6 +1277,25 @@ class TrayIcon(QSystemTrayIcon):
 
         self.activated.connect(self.on_click)
 
+    def open_archive(self):
+        from ai_voice_answers.modules.session_store import get_session_store
+        from ai_voice_answers.modules.warchive      import ArchiveWindow
+        
+        config_gpt = CONFIG_GPT.get()
+        try:
+            store = get_session_store(config_gpt["session_db"] or None)
+        except Exception as e:
+            print("Error opening the session store:", e)
+            return
+        if self.archive_window is None:
+            self.archive_window = ArchiveWindow(store, title=CONFIG["menubar_archive"])
+        else:
+            # mostra os turnos gravados desde a última vez
+            self.archive_window.apply_search()
+        self.archive_window.show()
+        self.archive_window.raise_()
+        self.archive_window.activateWindow()
+
     def open_configure_editor(self):
         open_file_in_text_editor(CONFIG_PATH)
         
@@ -772,26 +1320,57 @@ class TrayIcon(QSystemTrayIcon):
     def on_coffee_action_click(self):
         QDesktopServices.openUrl(QUrl("https://ko-fi.com/trucomanx"))
 
+    def ensure_window(self):
+        """
+        A janela é criada depois que o ícone aparece (ou no primeiro clique).
+        """
+        if self.window is None:
+            self.window = MainWindow()
+            self.window.hide()  # janela NÃO é principal
+        return self.window
+
     def show_window(self):
+        self.ensure_window()
         self.window.show()
         self.window.raise_()
         self.window.activateWindow()
 
     def hide_window(self):
-        self.window.hide()
+        if self.window is not None:
+            self.window.hide()
+
+    def toggle_continuous(self, checked):
+        self.ensure_window().set_continuous(checked)
        
     def quit_app(self):
+        if self.window is None:
+            self.hide()
+            self.app.quit()
+            return
     
+        self.window.set_continuous(False)
+        
         # parar player se existir
         if hasattr(self.window, "player") and self.window.player.isRunning():
-            self.window.player.quit()
+            self.window.player.stop()
             self.window.player.wait()
 
-        # parar worker se existir
-        if hasattr(self.window, "worker") and self.window.worker.isRunning():
-            self.window.worker.quit()
-            self.window.worker.wait()
+        # esperar os jobs em processamento
+        self.window.jobs.wait_all()
+        self.window.loop.close()
+        self.window.engine.close()
     
+        # só fecha o stream se o módulo de playback chegou a ser usado
+        playback = sys.modules.get("ai_voice_answers.modules.playback")
+        if playback is not None:
+            playback.get_playback_engine().close()
+        http_pool = sys.modules.get("ai_voice_answers.modules.http_pool")
+        if http_pool is not None:
+            http_pool.close_all()
+        telemetry.shutdown()
+        session_store = sys.modules.get("ai_voice_answers.modules.session_store")
+        if session_store is not None:
+            session_store.shutdown()
         self.window.cleanup_temp_dir()
         self.hide()
         self.app.quit()
@@ -805,33 +1384,84 @@ class TrayIcon(QSystemTrayIcon):
 # MAIN
 # =========================
 def main():
+    t_start = time.perf_counter()
+    timings = {}
+    def mark(name):
+        timings[name] = round(1000 * (time.perf_counter() - t_start), 1)
+    
+    # ai-voice-answers batch ...: sem interface (ver batch.py)
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from ai_voice_answers.batch import main as batch_main
+        init_config()
+        sys.exit(batch_main(sys.argv[2:], CONFIG_GPT))
+    
+    # ai-voice-answers --serve ...: o pipeline para outros computadores (ver server.py)
+    if "--serve" in sys.argv[1:]:
+        from ai_voice_answers.server import main as serve_main
+        init_config()
+        sys.exit(serve_main([arg for arg in sys.argv[1:] if arg != "--serve"], CONFIG_GPT))
+    
     # Captura de sinal Ctrl+C no terminal
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     
-    create_desktop_directory()    
-    create_desktop_menu()
-    create_desktop_file(os.path.join("~",".local","share","applications"))
+    init_config()
+    mark("config_ms")
+    
+    # Só escreve o que mudou; a base de atalhos é atualizada depois da UI.
+    # O stamp é lido e salvo uma vez para todos os arquivos.
+    pending_database = []
+    applications_path = os.path.join("~",".local","share","applications")
+    stamp = load_stamp()
+    loaded_stamp = dict(stamp)
+    
+    create_desktop_directory(stamp=stamp)
+    create_desktop_menu(stamp=stamp)
+    if create_desktop_file(applications_path, update_database=False, stamp=stamp):
+        pending_database.append(applications_path)
     
     for n in range(len(sys.argv)):
         if sys.argv[n] == "--autostart":
-            create_desktop_directory(overwrite = True)
-            create_desktop_menu(overwrite = True)
-            create_desktop_file(os.path.join("~",".config","autostart"), overwrite=True)
+            create_desktop_directory(overwrite = True, stamp=stamp)
+            create_desktop_menu(overwrite = True, stamp=stamp)
+            create_desktop_file(os.path.join("~",".config","autostart"), overwrite=True, stamp=stamp)
+            if stamp != loaded_stamp:
+                save_stamp(stamp)
             return
         if sys.argv[n] == "--applications":
-            create_desktop_directory(overwrite = True)
-            create_desktop_menu(overwrite = True)
-            create_desktop_file(os.path.join("~",".local","share","applications"), overwrite=True)
+            create_desktop_directory(overwrite = True, stamp=stamp)
+            create_desktop_menu(overwrite = True, stamp=stamp)
+            if create_desktop_file(applications_path, overwrite=True, update_database=False, stamp=stamp):
+                pending_database.append(applications_path)
+    if stamp != loaded_stamp:
+        save_stamp(stamp)
+    mark("desktop_ms")
     
     app = QApplication(sys.argv)
     app.setApplicationName(about.__package__) # xprop WM_CLASS # *.desktop -> StartupWMClass  
     app.setQuitOnLastWindowClosed(False)
+    mark("qapplication_ms")
 
-    window = MainWindow()
-    window.hide()  # janela NÃO é principal
-
-    tray = TrayIcon(window, app)
+    # O ícone aparece primeiro; a janela e os módulos pesados vêm depois
+    tray = TrayIcon(None, app)
     tray.show()
+    mark("tray_visible_ms")
+
+    if "--startup-benchmark" in sys.argv:
+        # Mede e sai (ver benchmarks/bench_startup.py)
+        def report():
+            tray.ensure_window()
+            mark("window_ms")
+            timings["warm_up_imports_ms"] = round(1000 * warm_up_imports(), 1)
+            print("STARTUP", json.dumps(timings), flush=True)
+            tray.quit_app()
+        QTimer.singleShot(0, report)
+    else:
+        def after_tray():
+            tray.ensure_window()
+            for path in set(pending_database):
+                update_desktop_database_async(path)
+            threading.Thread(target=warm_up_imports, daemon=True).start()
+        QTimer.singleShot(0, after_tray)
 
     sys.exit(app.exec_())
 
@@ -0,0 +1,738 @@
+#!/usr/bin/python3
+
+'''
+Modo servidor: o pipeline (PipelineEngine) atrás de HTTP e WebSocket, para
+clientes leves em outras máquinas (outros desktops, um quiosque).
+Todos os clientes usam o mesmo engine: o pool HTTP da API, os caches de
+transcrição/respostas/TTS e os limites por etapa são compartilhados; cada
+cliente tem o seu histórico (uma Conversation) e um limite próprio de
+perguntas ao mesmo tempo.
+
+ai-voice-answers --serve
+ai-voice-answers --serve --host 0.0.0.0 --port 8765 --token SECRET --jobs 16
+
+Precisa do aiohttp (pip install "ai_voice_answers[serve]"). O protocolo
+está em doc/SERVER.md.
+'''
+
+import os
+import sys
+import json
+import time
+import uuid
+import hmac
+import base64
+import shutil
+import asyncio
+import argparse
+import tempfile
+from collections import OrderedDict
+
+import ai_voice_answers.about as about
+from ai_voice_answers.modules import telemetry
+
+SAMPLERATE = 16000
+
+# eventos do engine repassados ao cliente como texto
+TEXT_EVENTS = ("transcription", "partial_response", "response")
+
+# status HTTP de cada erro de engine.ask()/VoiceServer.ask()
+ERROR_STATUS = {"no_speech": 422, "no_api_key": 503, "busy": 503, "cancelled": 500, "exception": 500}
+
+CONTENT_TYPES = {
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/mpeg": "mp3",
+    "audio/ogg": "ogg",
+    "audio/opus": "opus",
+    "audio/webm": "webm",
+    "audio/flac": "flac",
+    "audio/aac": "aac",
+    "audio/mp4": "m4a",
+    "audio/l16": "pcm",
+}
+
+# formatos aceitos para o áudio das perguntas ("pcm" é int16 mono)
+AUDIO_FORMATS = ("pcm", "wav", "mp3", "ogg", "opus", "webm", "flac", "aac", "m4a")
+
+MIN_SAMPLERATE = 8000
+MAX_SAMPLERATE = 96000
+
+# arquivos no diretório temporário mais velhos que isso são apagados
+# (trechos de respostas canceladas ou que falharam)
+TEMP_MAX_AGE_S = 600
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def read_and_remove(path):
+    data = read_file(path)
+    os.remove(path)
+    return data
+
+def audio_params(fmt, samplerate):
+    """
+    (formato, samplerate) validados; ValueError com a mensagem para o
+    cliente se não servem.
+    """
+    fmt = str(fmt or "pcm").lower()
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError("Unknown audio format: {} (use one of: {})".format(fmt, ", ".join(AUDIO_FORMATS)))
+    try:
+        samplerate = int(samplerate)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid samplerate: {}".format(samplerate))
+    if not MIN_SAMPLERATE <= samplerate <= MAX_SAMPLERATE:
+        raise ValueError("The samplerate must be between {} and {}".format(MIN_SAMPLERATE, MAX_SAMPLERATE))
+    return fmt, samplerate
+
+def audio_format(path):
+    # extensão do arquivo gerado pelo backend de TTS
+    return os.path.splitext(path)[1].lstrip(".").lower()
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def remove_old_files(dir_path, max_age_s=TEMP_MAX_AGE_S):
+    now = time.time()
+    with os.scandir(dir_path) as entries:
+        old = [e.path for e in entries if e.is_file() and now - e.stat().st_mtime > max_age_s]
+    remove_files(old)
+
+
+class AudioUpload:
+    """
+    Áudio de uma pergunta recebido aos pedaços: PCM int16 mono (num
+    CaptureBuffer; com incremental_transcription os trechos entre pausas já
+    são transcritos enquanto o resto chega, como na gravação da janela) ou
+    os bytes de um arquivo (wav, mp3, ogg...).
+    Formato ou samplerate inválidos levantam ValueError.
+    """
+    def __init__(self, config_gpt, fmt="pcm", samplerate=SAMPLERATE, language=None, max_bytes=None, incremental=True):
+        from ai_voice_answers.modules.capture_buffer import CaptureBuffer
+        from ai_voice_answers.modules.incremental    import IncrementalTranscriber
+
+        self.format, self.samplerate = audio_params(fmt, samplerate)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.parts = []
+        self.rest = b""
+        self.buffer = None
+        self.transcriber = None
+        if self.format == "pcm":
+            self.buffer = CaptureBuffer(self.samplerate, 1)
+            if incremental and config_gpt["incremental_transcription"] and len(config_gpt["api_key"].strip()) > 0:
+                self.transcriber = IncrementalTranscriber(config_gpt, self.samplerate, language=language)
+                self.pause_ms = config_gpt["incremental_pause_ms"]
+                self.min_chunk_s = config_gpt["incremental_min_chunk_s"]
+                self.silence_rms = config_gpt["incremental_silence_rms"]
+                self.chunk_start = 0
+                self.chunk_samples = 0
+                self.silence_samples = 0
+
+    def write(self, data):
+        """
+        Acrescenta data; False se passou de max_bytes.
+        """
+        import numpy as np
+
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            return False
+        if self.buffer is None:
+            self.parts.append(data)
+            return True
+
+        data = self.rest + data
+        n = len(data) - len(data) % 2
+        self.rest = data[n:]
+        block = np.frombuffer(data[:n], dtype=np.int16).reshape(-1, 1)
+        if block.shape[0] == 0:
+            return True
+        self.buffer.write(block)
+        if self.transcriber is not None:
+            self._detect_pause(block)
+        return True
+
+    def _detect_pause(self, block):
+        # como AudioRecorder._detect_pause, por bloco recebido
+        frames = block.shape[0]
+        if self.buffer.rms(block) < self.silence_rms:
+            self.silence_samples += frames
+        else:
+            self.silence_samples = 0
+        self.chunk_samples += frames
+
+        if (self.chunk_samples >= self.min_chunk_s * self.samplerate and
+            self.silence_samples >= self.pause_ms * self.samplerate / 1000.0):
+            self.transcriber.add_chunk(self.buffer.view(self.chunk_start))
+            self.chunk_start = self.buffer.length
+            self.chunk_samples = 0
+
+    def ask_args(self):
+        """
+        Argumentos de PipelineEngine.ask() para este áudio.
+        """
+        if self.buffer is None:
+            return {"source": ("question." + self.format, b"".join(self.parts))}
+        # último trecho (o que sobrou depois do último corte)
+        if self.transcriber is not None and self.chunk_start < self.buffer.length:
+            self.transcriber.add_chunk(self.buffer.view(self.chunk_start))
+            self.chunk_start = self.buffer.length
+        return {"pcm": self.buffer.view(), "samplerate": self.samplerate, "transcriber": self.transcriber}
+
+    def cancel(self):
+        if self.transcriber is not None:
+            self.transcriber.cancel()
+            self.transcriber = None
+
+
+class Client:
+    """
+    Um cliente (client_id): a conversa com histórico, o limite de perguntas
+    ao mesmo tempo e o que o mantém vivo no registro.
+    """
+    def __init__(self, client_id, max_jobs, session=None):
+        from ai_voice_answers.modules.engine import Conversation
+
+        self.id = client_id
+        self.conversation = Conversation(session)
+        self.semaphore = asyncio.Semaphore(max_jobs)
+        self.active = 0
+        self.connections = 0
+        self.last_seen = time.monotonic()
+
+    def idle(self):
+        return self.active == 0 and self.connections == 0
+
+
+class Connection:
+    """
+    Um WebSocket: as mensagens de cada resposta (JSON e, para o áudio, um
+    quadro binário logo depois) saem sem se misturar com as das outras
+    perguntas em andamento.
+    """
+    def __init__(self, ws, client):
+        self.ws = ws
+        self.client = client
+        self.lock = asyncio.Lock()
+        # id da pergunta -> tarefa de VoiceServer.answer()
+        self.answers = {}
+
+    async def send(self, message, data=None):
+        if self.ws.closed:
+            return
+        try:
+            async with self.lock:
+                await self.ws.send_str(json.dumps(message, ensure_ascii=False))
+                if data is not None:
+                    await self.ws.send_bytes(data)
+        except ConnectionError:
+            pass
+
+    async def error(self, qid, error, message=None):
+        await self.send({"type": "error", "id": qid, "error": error, "message": message or error})
+
+    def cancel(self, qid=None):
+        for key, task in list(self.answers.items()):
+            if qid is None or key == qid:
+                task.cancel()
+
+
+class VoiceServer:
+    """
+    Um PipelineEngine para todos os clientes, com:
+    - limites por etapa (engine) e de perguntas ao mesmo tempo no total
+      ("jobs"); max_queue perguntas esperando ou em andamento, além disso
+      o servidor responde "busy";
+    - um registro de até max_clients clientes; os que estão parados há mais
+      de idle_s (sem conexão nem pergunta) são esquecidos.
+    """
+    def __init__(  self, config_manager, limits, max_clients=100, client_jobs=2, max_queue=64,
+                    idle_s=1800.0, max_upload_bytes=25 * 1024 * 1024, token=None):
+        from ai_voice_answers.modules.engine import PipelineEngine
+
+        self.config_manager = config_manager
+        self.max_clients = max_clients
+        self.client_jobs = max(1, int(client_jobs))
+        self.max_queue = max(1, int(max_queue))
+        self.idle_s = idle_s
+        self.max_upload_bytes = max_upload_bytes
+        self.token = token
+        self.dir_temp = tempfile.mkdtemp(prefix=about.__package__ + "_serve_")
+        self.engine = PipelineEngine(   config_manager.get,
+                                        self.dir_temp,
+                                        limits=limits,
+                                        max_threads=sum(limits.values()))
+        self.clients = OrderedDict()
+        self.questions = 0
+        self.answered = 0
+
+    # -------------------------
+    # CLIENTS
+    # -------------------------
+    def new_session(self):
+        from ai_voice_answers.modules.session_store import get_session_store
+
+        config_gpt = self.config_manager.get()
+        if not config_gpt["session_store"]:
+            return None
+        try:
+            return get_session_store(config_gpt["session_db"] or None).new_session()
+        except Exception as e:
+            print("Error opening the session store:", e)
+            return None
+
+    def get_client(self, client_id=None):
+        """
+        O cliente client_id (criado se não existir), ou None se o registro
+        está cheio. Sem client_id é um cliente avulso, com um id novo, que
+        não entra no registro (não tira o lugar dos clientes com id).
+        """
+        if not client_id:
+            return Client(uuid.uuid4().hex, self.client_jobs, self.new_session())
+
+        now = time.monotonic()
+        for key in [k for k, c in self.clients.items() if c.idle() and now - c.last_seen > self.idle_s]:
+            del self.clients[key]
+
+        client = self.clients.get(client_id)
+        if client is None:
+            if len(self.clients) >= self.max_clients:
+                # o mais antigo que não está em uso
+                oldest = next((k for k, c in self.clients.items() if c.idle()), None)
+                if oldest is None:
+                    return None
+                del self.clients[oldest]
+            client = Client(client_id, self.client_jobs, self.new_session())
+            self.clients[client.id] = client
+        self.clients.move_to_end(client.id)
+        client.last_seen = now
+        return client
+
+    def new_turn(self, client):
+        config_gpt = self.config_manager.get()
+        recorder = telemetry.get_turn_recorder(config_gpt["telemetry_log"] or None) if config_gpt["telemetry"] else None
+        # sem reprodução no servidor
+        turn = telemetry.Turn(recorder=recorder, pending=("processing",))
+        turn.set("client", client.id)
+        return turn
+
+    async def ask(self, client, on_event=None, use_history=True, language=None, **kwargs):
+        """
+        engine.ask() dentro dos limites do cliente e do servidor.
+        """
+        if self.questions >= self.max_queue:
+            # o engine não vai receber o transcritor: a thread dele terminaria só no fim do programa
+            if kwargs.get("transcriber") is not None:
+                kwargs["transcriber"].cancel()
+            return {"error": "busy", "message": "Too many questions in progress"}
+        self.questions += 1
+        client.active += 1
+        try:
+            async with client.semaphore:
+                return await self.engine.ask(   use_history = use_history,
+                                                conversation = client.conversation,
+                                                turn = self.new_turn(client),
+                                                on_event = on_event,
+                                                language = language,
+                                                **kwargs)
+        finally:
+            self.questions -= 1
+            self.answered += 1
+            client.active -= 1
+            client.last_seen = time.monotonic()
+
+    # -------------------------
+    # HTTP
+    # -------------------------
+    def authorized(self, request):
+        if not self.token:
+            return True
+        header = request.headers.get("Authorization", "")
+        given = header[7:] if header.startswith("Bearer ") else request.query.get("token", "")
+        return hmac.compare_digest(given.encode("utf-8"), self.token.encode("utf-8"))
+
+    def request_client(self, request):
+        from aiohttp import web
+
+        client_id = request.query.get("client") or request.headers.get("X-Client-Id")
+        if client_id is not None and not (0 < len(client_id) <= 64):
+            raise self.bad_request("Invalid client id")
+        client = self.get_client(client_id)
+        if client is None:
+            raise web.HTTPServiceUnavailable(text="Too many clients")
+        return client
+
+    @staticmethod
+    def bad_request(message):
+        from aiohttp import web
+
+        return web.HTTPBadRequest(  text=json.dumps({"error": "bad_request", "message": message}),
+                                    content_type="application/json")
+
+    @staticmethod
+    def flag(value, default):
+        if value is None:
+            return default
+        return str(value).lower() not in ("0", "false", "no", "off", "")
+
+    async def read_question(self, request):
+        """
+        Corpo de POST /ask -> (argumentos de ask(), parâmetros): JSON com
+        "question", formulário multipart com o arquivo em "audio", ou o
+        áudio direto no corpo (PCM com ?format=pcm&samplerate=16000).
+        """
+        from aiohttp import web
+
+        params = dict(request.query)
+        content_type = request.content_type.lower()
+        config_gpt = self.config_manager.get()
+
+        if content_type == "application/json":
+            try:
+                data = await request.json()
+            except ValueError:
+                raise self.bad_request("Invalid JSON")
+            if not isinstance(data, dict):
+                raise self.bad_request("Expected a JSON object")
+            params.update({k: v for k, v in data.items() if k != "question"})
+            if not isinstance(data.get("question"), str) or not data["question"].strip():
+                raise self.bad_request("Missing question")
+            return {"question": data["question"]}, params
+
+        if content_type == "multipart/form-data":
+            fields = await request.post()
+            params.update({k: v for k, v in fields.items() if isinstance(v, str)})
+            audio = fields.get("audio")
+            if audio is None or isinstance(audio, str):
+                raise self.bad_request("Missing audio file")
+            data = audio.file.read()
+            ext = os.path.splitext(audio.filename or "")[1].lstrip(".") or CONTENT_TYPES.get(audio.content_type, "wav")
+            try:
+                ext, _ = audio_params(ext, SAMPLERATE)
+            except ValueError as e:
+                raise self.bad_request(str(e))
+            if ext == "pcm":
+                raise self.bad_request("Send PCM in the request body with ?format=pcm")
+            return {"source": ("question." + ext, data)}, params
+
+        fmt = params.get("format") or CONTENT_TYPES.get(content_type, "wav")
+        # o corpo chega inteiro: nada a transcrever antes do fim
+        try:
+            upload = AudioUpload(   config_gpt,
+                                    fmt,
+                                    samplerate=params.get("samplerate", SAMPLERATE),
+                                    max_bytes=self.max_upload_bytes,
+                                    incremental=False)
+        except ValueError as e:
+            raise self.bad_request(str(e))
+        if not upload.write(await request.read()):
+            raise web.HTTPRequestEntityTooLarge(max_size=self.max_upload_bytes, actual_size=upload.size)
+        return upload.ask_args(), params
+
+    def error_response(self, client, res):
+        from aiohttp import web
+
+        return web.json_response(   {"client": client.id, "error": res["error"], "message": res.get("message", res["error"])},
+                                    status=ERROR_STATUS.get(res["error"], 500))
+
+    async def http_ask(self, request):
+        from aiohttp import web
+
+        client = self.request_client(request)
+        args, params = await self.read_question(request)
+
+        # sem client_id a pergunta é avulsa, sem histórico
+        has_id = "client" in request.query or "X-Client-Id" in request.headers
+        chunks = []
+        def on_event(name, value=None):
+            if name == "audio_chunk":
+                chunks.append(value)
+
+        res = await self.ask(   client,
+                                on_event = on_event,
+                                use_history = self.flag(params.get("history"), has_id),
+                                language = params.get("language"),
+                                **args)
+        await self.engine.run_blocking(None, None, remove_files, chunks)
+        if "error" in res:
+            return self.error_response(client, res)
+
+        audio = await self.engine.run_blocking(None, None, read_and_remove, res["response_audio_path"])
+        return web.json_response({
+            "client": client.id,
+            "transcription": res["transcription"],
+            "response": res["response"],
+            "audio": base64.b64encode(audio).decode("ascii"),
+            "audio_format": audio_format(res["response_audio_path"]),
+            "timing": res["turn"].to_dict()["totals_ms"]
+        })
+
+    async def http_clear(self, request):
+        from aiohttp import web
+
+        client = self.request_client(request)
+        client.conversation.clear()
+        return web.json_response({"client": client.id, "cleared": True})
+
+    async def http_health(self, request):
+        from aiohttp import web
+
+        return web.json_response({
+            "clients": len(self.clients),
+            "questions": self.questions,
+            "answered": self.answered,
+            "limits": self.engine.limits
+        })
+
+    async def http_metrics(self, request):
+        from aiohttp import web
+
+        config_gpt = self.config_manager.get()
+        if not config_gpt["telemetry"]:
+            raise web.HTTPNotFound(text="Telemetry is off")
+        metrics = telemetry.get_turn_recorder(config_gpt["telemetry_log"] or None).metrics
+        return web.Response(text=metrics.render(), content_type="text/plain")
+
+    # -------------------------
+    # WEBSOCKET
+    # -------------------------
+    async def websocket(self, request):
+        from aiohttp import web, WSMsgType
+
+        client = self.request_client(request)
+        ws = web.WebSocketResponse(heartbeat=30.0, max_msg_size=self.max_upload_bytes)
+        await ws.prepare(request)
+
+        conn = Connection(ws, client)
+        client.connections += 1
+        defaults = {"history": self.flag(request.query.get("history"), True),
+                    "language": request.query.get("language")}
+        upload = None
+        upload_id = None
+        await conn.send({"type": "hello", "client": client.id})
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.BINARY:
+                    if upload is None:
+                        await conn.error(None, "bad_request", "Binary frame without start")
+                    elif not upload.write(msg.data):
+                        upload.cancel()
+                        upload = None
+                        await conn.error(upload_id, "too_large", "Audio larger than the upload limit")
+                    continue
+                if msg.type != WSMsgType.TEXT:
+                    break
+
+                try:
+                    data = json.loads(msg.data)
+                    kind = data["type"]
+                except (ValueError, TypeError, KeyError):
+                    await conn.error(None, "bad_request", "Expected a JSON object with a type")
+                    continue
+                qid = data.get("id")
+                options = {"use_history": self.flag(data.get("history"), defaults["history"]),
+                           "language": data.get("language") or defaults["language"]}
+
+                if kind == "start":
+                    if upload is not None:
+                        upload.cancel()
+                        upload = None
+                    upload_id = qid
+                    try:
+                        upload = AudioUpload(   self.config_manager.get(),
+                                                data.get("format", "pcm"),
+                                                samplerate=data.get("samplerate", SAMPLERATE),
+                                                language=options["language"] or self.config_manager.get()["language"],
+                                                max_bytes=self.max_upload_bytes)
+                    except ValueError as e:
+                        await conn.error(qid, "bad_request", str(e))
+                elif kind == "end":
+                    if upload is None:
+                        await conn.error(qid, "bad_request", "end without start")
+                        continue
+                    self.start_answer(conn, upload_id if qid is None else qid, options, upload.ask_args())
+                    upload = None
+                elif kind == "question":
+                    if not isinstance(data.get("text"), str) or not data["text"].strip():
+                        await conn.error(qid, "bad_request", "Missing text")
+                        continue
+                    self.start_answer(conn, qid, options, {"question": data["text"]})
+                elif kind == "cancel":
+                    conn.cancel(qid)
+                elif kind == "clear":
+                    client.conversation.clear()
+                    await conn.send({"type": "cleared"})
+                else:
+                    await conn.error(qid, "bad_request", "Unknown message type: " + str(kind))
+        finally:
+            if upload is not None:
+                upload.cancel()
+            conn.cancel()
+            client.connections -= 1
+            client.last_seen = time.monotonic()
+        return ws
+
+    def start_answer(self, conn, qid, options, args):
+        if qid is None:
+            qid = uuid.uuid4().hex[:8]
+        task = asyncio.ensure_future(self.answer(conn, qid, options, args))
+        conn.answers[qid] = task
+        task.add_done_callback(lambda _: conn.answers.pop(qid, None) if conn.answers.get(qid) is task else None)
+
+    async def answer(self, conn, qid, options, args):
+        """
+        Responde uma pergunta do WebSocket: texto e trechos de áudio são
+        enviados conforme o engine os produz. A resposta é sempre em
+        streaming (com ou sem stream_response na configuração): o áudio de
+        cada frase sai enquanto o LLM continua escrevendo.
+        """
+        events = asyncio.Queue()
+        task = asyncio.ensure_future(self.ask(  conn.client,
+                                                on_event = lambda name, value=None: events.put_nowait((name, value)),
+                                                stream_response = True,
+                                                **options,
+                                                **args))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+
+        # os trechos só são apagados no fim: o engine junta todos num arquivo
+        chunks = []
+        try:
+            await conn.send({"type": "accepted", "id": qid})
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                name, value = item
+                if name in TEXT_EVENTS:
+                    await conn.send({"type": name, "id": qid, "text": value})
+                elif name == "audio_chunk":
+                    data = await self.engine.run_blocking(None, None, read_file, value)
+                    await conn.send({"type": "audio", "id": qid, "index": len(chunks), "format": audio_format(value), "bytes": len(data)}, data)
+                    chunks.append(value)
+        except asyncio.CancelledError:
+            task.cancel()
+            await conn.error(qid, "cancelled", "Cancelled")
+            return
+        finally:
+            await self.engine.run_blocking(None, None, remove_files, chunks)
+
+        if task.cancelled():
+            await conn.error(qid, "cancelled", "Cancelled")
+            return
+        res = task.result()
+        if "error" in res:
+            await conn.error(qid, res["error"], res.get("message"))
+            return
+
+        if res["streamed"]:
+            await self.engine.run_blocking(None, None, remove_files, [res["response_audio_path"]])
+        else:
+            # resposta do cache de respostas: já inteira, um trecho só
+            data = await self.engine.run_blocking(None, None, read_and_remove, res["response_audio_path"])
+            await conn.send({   "type": "audio", "id": qid, "index": 0,
+                                "format": audio_format(res["response_audio_path"]), "bytes": len(data)}, data)
+        await conn.send({   "type": "done",
+                            "id": qid,
+                            "transcription": res["transcription"],
+                            "response": res["response"],
+                            "timing": res["turn"].to_dict()["totals_ms"]})
+
+    # -------------------------
+    # APP
+    # -------------------------
+    def make_app(self):
+        from aiohttp import web
+
+        @web.middleware
+        async def auth(request, handler):
+            if not self.authorized(request):
+                raise web.HTTPUnauthorized(text="Missing or wrong token")
+            return await handler(request)
+
+        app = web.Application(middlewares=[auth], client_max_size=self.max_upload_bytes)
+        app.router.add_get("/health", self.http_health)
+        app.router.add_get("/metrics", self.http_metrics)
+        app.router.add_post("/ask", self.http_ask)
+        app.router.add_delete("/history", self.http_clear)
+        app.router.add_get("/ws", self.websocket)
+        app.on_startup.append(self.startup)
+        app.on_cleanup.append(self.cleanup)
+        return app
+
+    async def sweep_temp(self):
+        while True:
+            await asyncio.sleep(60)
+            await self.engine.run_blocking(None, None, remove_old_files, self.dir_temp)
+
+    async def startup(self, app):
+        self.sweeper = asyncio.ensure_future(self.sweep_temp())
+
+    async def cleanup(self, app):
+        from ai_voice_answers.modules import http_pool
+
+        self.sweeper.cancel()
+        await asyncio.get_running_loop().run_in_executor(None, self.engine.close)
+        http_pool.close_all()
+        telemetry.shutdown()
+        session_store = sys.modules.get("ai_voice_answers.modules.session_store")
+        if session_store is not None:
+            session_store.shutdown()
+        shutil.rmtree(self.dir_temp, ignore_errors=True)
+
+
+def main(argv, config_manager):
+    parser = argparse.ArgumentParser(   prog="ai-voice-answers --serve",
+                                        description="Serve the voice pipeline over HTTP and WebSocket")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for the whole network)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default=os.environ.get("AI_VOICE_ANSWERS_TOKEN"),
+                        help="shared secret the clients must send (default: $AI_VOICE_ANSWERS_TOKEN)")
+    parser.add_argument("--jobs", type=int, default=8, help="questions answered at the same time, all clients")
+    parser.add_argument("--client-jobs", type=int, default=2, help="questions at the same time per client")
+    parser.add_argument("--max-queue", type=int, default=64, help="questions waiting or in progress before answering busy")
+    parser.add_argument("--max-clients", type=int, default=100, help="client histories kept in memory")
+    parser.add_argument("--idle-minutes", type=float, default=30.0, help="forget a client history after this idle time")
+    parser.add_argument("--max-upload-mb", type=float, default=25.0)
+    parser.add_argument("--decode-jobs", type=int, default=2)
+    parser.add_argument("--transcribe-jobs", type=int, default=4)
+    parser.add_argument("--llm-jobs", type=int, default=4)
+    parser.add_argument("--tts-jobs", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    try:
+        from aiohttp import web
+    except ImportError:
+        print('The server mode needs aiohttp: pip install "ai_voice_answers[serve]"', file=sys.stderr)
+        return 2
+
+    config_gpt = config_manager.get()
+    if len(config_gpt["api_key"].strip()) == 0:
+        print("No API key in", config_manager.path, file=sys.stderr)
+        return 2
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        print("⚠️ Listening on {} without --token: anyone on the network can use the API key".format(args.host))
+
+    limits = {  "jobs": args.jobs,
+                "decode": args.decode_jobs,
+                "transcription": args.transcribe_jobs,
+                "llm": args.llm_jobs,
+                "tts": args.tts_jobs}
+    server = VoiceServer(   config_manager,
+                            {stage: max(1, n) for stage, n in limits.items()},
+                            max_clients = args.max_clients,
+                            client_jobs = args.client_jobs,
+                            max_queue = args.max_queue,
+                            idle_s = 60.0 * args.idle_minutes,
+                            max_upload_bytes = int(args.max_upload_mb * 1024 * 1024),
+                            token = args.token)
+    print("🌐 Serving on http://{}:{} (ws://{}:{}/ws)".format(args.host, args.port, args.host, args.port), flush=True)
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+    return 0
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+'''
+Compara os codecs de upload (encoding.encode_audio): tempo de codificação
+vs tamanho do payload, e estima o tempo total de envio para uma dada
+velocidade de upload.
+
+cd src
+python3 -m benchmarks.bench_encoding --seconds 20 --uplink-mbps 5
+python3 -m benchmarks.bench_encoding --input pergunta.mp3
+'''
+
+import time
+import argparse
+import numpy as np
+
+from ai_voice_answers.modules.encoding import encode_audio
+
+SETTINGS = [
+    ("wav",  None),
+    ("flac", None),
+    ("opus", "16k"),
+    ("opus", "32k"),
+    ("mp3",  "32k"),
+    ("mp3",  "64k"),
+    ("mp3",  None),
+]
+
+def synthetic_speech(seconds, samplerate):
+    """
+    Sinal parecido com voz: harmônicos de um pitch variável, com envelope
+    silábico e pausas, mais um pouco de ruído.
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / samplerate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None) * (np.sin(2 * np.pi * 0.2 * t) > -0.5)
+    audio = 0.3 * voice * envelope + 0.005 * rng.standard_normal(t.size)
+    audio = np.clip(audio, -1.0, 1.0)
+    return (audio * 32767).astype(np.int16).reshape(-1, 1)
+
+def load_audio(path, samplerate):
+    from pydub import AudioSegment
+    seg = AudioSegment.from_file(path).set_channels(1).set_frame_rate(samplerate).set_sample_width(2)
+    return np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload codec benchmark")
+    parser.add_argument("--input", help="audio file to use instead of synthetic speech")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--samplerate", type=int, default=16000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--uplink-mbps", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.input:
+        audio = load_audio(args.input, args.samplerate)
+    else:
+        audio = synthetic_speech(args.seconds, args.samplerate)
+    seconds = audio.shape[0] / float(args.samplerate)
+    
+    print("audio: {:.1f} s @ {} Hz, uplink {} Mbit/s".format(seconds, args.samplerate, args.uplink_mbps))
+    print("{:<6} {:>8} {:>12} {:>12} {:>12}".format("codec", "bitrate", "encode ms", "payload KiB", "total ms"))
+
+    for codec, bitrate in SETTINGS:
+        times = []
+        try:
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                _, data = encode_audio(audio, args.samplerate, codec=codec, bitrate=bitrate)
+                times.append(time.perf_counter() - t0)
+        except Exception as e:
+            print("{:<6} {:>8} error: {}".format(codec, str(bitrate), e))
+            continue
+        
+        encode_ms = 1000 * float(np.median(times))
+        upload_ms = 1000 * len(data) * 8 / (args.uplink_mbps * 1e6)
+        print("{:<6} {:>8} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                codec, str(bitrate), encode_ms, len(data) / 1024.0, encode_ms + upload_ms))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+
+'''
+Custo da lista do histórico (history_view.HistoryView) com históricos
+longos, sem display (plataforma offscreen do Qt):
+- tempo de cada evento de resize (arrastando a borda da janela) e do
+  relayout final, com e sem o cache de alturas e o debounce;
+- relayout do histórico inteiro (todas as linhas pedem a altura de novo):
+  com uma largura nova (cache frio) e com a mesma largura (cache quente),
+  tempo total e maior bloqueio da UI, em lotes (Batched) ou de uma vez;
+- tempo para acrescentar um turno novo;
+- tempo de um quadro (repintar o viewport).
+
+cd src
+QT_QPA_PLATFORM=offscreen python3 -m benchmarks.bench_history --messages 1000 5000 20000
+'''
+
+import os
+import time
+import argparse
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from ai_voice_answers.modules.history_view import HistoryView
+
+def make_history(n_messages):
+    history = []
+    for i in range(n_messages // 2):
+        history.append({"role": "user", "content": "Question {}: ".format(i) + "how does this work? " * (1 + i % 4)})
+        history.append({"role": "assistant", "content": "Answer {}: ".format(i) + "it works like this. " * (3 + i % 17)})
+    return history
+
+def settle(app, view):
+    """
+    Processa eventos até o layout (feito em lotes) e o timer de debounce
+    terminarem: o delegate para de receber pedidos de altura.
+    Retorna o maior tempo de uma volta do loop de eventos (a UI travada).
+    """
+    delegate = view.itemDelegate()
+    deadline = time.perf_counter() + 120
+    stable = 0
+    last = None
+    stall = 0.0
+    while time.perf_counter() < deadline and stable < 20:
+        t = time.perf_counter()
+        app.processEvents()
+        stall = max(stall, time.perf_counter() - t)
+        current = delegate.hits + delegate.misses
+        if current == last and not view.resize_timer.isActive():
+            stable += 1
+        else:
+            stable = 0
+        last = current
+    return stall
+
+def full_relayout(app, view, width):
+    """
+    Relayout de todas as linhas com a largura width.
+    Retorna (tempo total, maior bloqueio da UI, linhas medidas).
+    """
+    delegate = view.itemDelegate()
+    asked = delegate.hits + delegate.misses
+    t = time.perf_counter()
+    if width != view.layout_width:
+        view.resize(width + view.width() - view.viewport().width(), view.height())
+        # sem esperar o debounce
+        view.resize_timer.stop()
+        view.apply_width()
+    else:
+        view.scheduleDelayedItemsLayout()
+    stall = settle(app, view)
+    return time.perf_counter() - t, stall, delegate.hits + delegate.misses - asked
+
+def run_case(app, history, debounce_ms, cache_size, batch_size, steps):
+    view = HistoryView(resize_debounce_ms=debounce_ms, cache_size=cache_size, batch_size=batch_size)
+    view.resize(600, 700)
+    view.show()
+    view.model().sync(history)
+    settle(app, view)
+    view.scrollToBottom()
+    settle(app, view)
+
+    # arrastar a borda: um evento de resize por quadro
+    events = []
+    for k in range(steps):
+        width = 600 + (k % 10) * 20 - 100
+        t = time.perf_counter()
+        view.resize(width, 700)
+        app.processEvents()
+        events.append(time.perf_counter() - t)
+    # fim do arrasto: espera o debounce e mede o relayout que falta
+    time.sleep(debounce_ms / 1000.0)
+    t = time.perf_counter()
+    settle(app, view)
+    final = time.perf_counter() - t
+
+    # histórico inteiro: largura nova (alturas medidas de novo) e a mesma
+    cold, cold_stall, rows = full_relayout(app, view, view.layout_width + 37)
+    warm, warm_stall, _ = full_relayout(app, view, view.layout_width)
+
+    # novo turno
+    new_turn = history + [  {"role": "user", "content": "One more question?"},
+                            {"role": "assistant", "content": "One more answer. " * 10}]
+    t = time.perf_counter()
+    view.model().sync(new_turn)
+    view.scrollToBottom()
+    settle(app, view)
+    append = time.perf_counter() - t
+
+    # um quadro
+    frames = []
+    for _ in range(20):
+        t = time.perf_counter()
+        view.viewport().repaint()
+        frames.append(time.perf_counter() - t)
+
+    view.close()
+    return {
+        "resize_event_ms": 1000 * statistics.mean(events),
+        "resize_event_max_ms": 1000 * max(events),
+        "relayout_ms": 1000 * final,
+        "drag_total_ms": 1000 * (sum(events) + final),
+        "full_cold_ms": 1000 * cold,
+        "full_cold_stall_ms": 1000 * cold_stall,
+        "full_warm_ms": 1000 * warm,
+        "full_warm_stall_ms": 1000 * warm_stall,
+        "full_rows": rows,
+        "append_ms": 1000 * append,
+        "frame_ms": 1000 * statistics.median(frames)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="History view layout benchmark")
+    parser.add_argument("--messages", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--steps", type=int, default=30, help="resize events per drag")
+    args = parser.parse_args()
+
+    app = QApplication([])
+    cases = [
+        ("no cache, no debounce", 0, 0, 100),
+        ("cache, no debounce", 0, 20000, 100),
+        ("cache + debounce", 120, 20000, 100),
+        ("cache + debounce, 1 pass", 120, 20000, 0),
+    ]
+    print("{:>8} {:<25} {:>10} {:>10} {:>11} {:>10} {:>10} {:>9}".format(
+            "messages", "mode", "resize ms", "max ms", "relayout ms", "drag ms", "append ms", "frame ms"))
+    full = []
+    for n in args.messages:
+        history = make_history(n)
+        for name, debounce_ms, cache_size, batch_size in cases:
+            r = run_case(app, history, debounce_ms, cache_size, batch_size, args.steps)
+            full.append((n, name, r))
+            print("{:>8} {:<25} {:>10.2f} {:>10.2f} {:>11.1f} {:>10.1f} {:>10.1f} {:>9.2f}".format(
+                    n, name, r["resize_event_ms"], r["resize_event_max_ms"],
+                    r["relayout_ms"], r["drag_total_ms"], r["append_ms"], r["frame_ms"]))
+
+    print()
+    print("Relayout of the whole history (new width / same width)")
+    print("{:>8} {:<25} {:>8} {:>9} {:>10} {:>9} {:>10}".format(
+            "messages", "mode", "rows", "new ms", "stall ms", "same ms", "stall ms"))
+    for n, name, r in full:
+        print("{:>8} {:<25} {:>8} {:>9.1f} {:>10.1f} {:>9.1f} {:>10.1f}".format(
+                n, name, r["full_rows"], r["full_cold_ms"], r["full_cold_stall_ms"],
+                r["full_warm_ms"], r["full_warm_stall_ms"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+
+'''
+Latência de ponta a ponta do pipeline (sem chave e sem rede), contra o
+servidor local benchmarks.mock_server:
+gravação -> VAD -> codificação -> transcrição -> LLM -> TTS -> decodificação.
+Cada turno é um PipelineEngine.ask() num EngineLoop, como na janela, com
+áudio sintético entregue em blocos de 20 ms ao CaptureBuffer (como faz o
+callback do PortAudio); os tempos vêm do telemetry.Turn da pergunta.
+Mostra p50/p95/p99 de cada etapa.
+
+cd src
+python3 -m benchmarks.bench_pipeline --turns 50 --latency-ms 150 --token-ms 20
+python3 -m benchmarks.bench_pipeline --stream --error-rate 0.05
+python3 -m benchmarks.bench_pipeline --history --turns 100 --context-tokens 4000 --prefill-ms 200
+python3 -m benchmarks.bench_pipeline --base-url https://api.deepinfra.com/v1/openai --api-key KEY
+'''
+
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.mock_server import MockSettings, start_server
+from benchmarks.bench_encoding import synthetic_speech
+
+from ai_voice_answers.modules.capture_buffer import CaptureBuffer
+from ai_voice_answers.modules.engine         import PipelineEngine, EngineLoop, Conversation
+from ai_voice_answers.modules.playback       import PlaybackEngine
+from ai_voice_answers.modules                import telemetry
+from ai_voice_answers.modules                import http_pool
+
+# llm_first_token e first_audio contam do início do LLM; play_decode é a
+# decodificação para tocar (PlaybackEngine.load, sem dispositivo de áudio)
+STAGES = ["capture", "vad", "encode", "transcription", "llm_first_token", "llm", "tts", "first_audio", "play_decode", "total"]
+
+def recording(seconds, samplerate):
+    """
+    Fala sintética com 1 s de silêncio antes e depois.
+    """
+    silence = np.zeros((samplerate, 1), dtype=np.int16)
+    return np.concatenate([silence, synthetic_speech(seconds, samplerate), silence])
+
+def capture(audio, samplerate, block_ms=20.0):
+    buffer = CaptureBuffer(samplerate, 1)
+    block = int(samplerate * block_ms / 1000.0)
+    for start in range(0, audio.shape[0], block):
+        chunk = audio[start:start + block]
+        buffer.write(chunk)
+        buffer.rms(chunk)
+    return buffer.view()
+
+def run_turn(audio, samplerate, engine, loop, player, system_data, conversation=None):
+    """
+    Um turno pelo caminho do programa; devolve os tempos em ms (etapas do
+    telemetry.Turn e os spans HTTP), ou levanta RuntimeError se falhou.
+    """
+    turn = telemetry.Turn(pending=())
+    t_start = time.perf_counter()
+
+    with turn.span("capture"):
+        pcm = capture(audio, samplerate)
+
+    def on_event(name, value=None):
+        # com streaming, o primeiro trecho; sem, o áudio sai com a resposta inteira
+        if name in ("audio_chunk", "done"):
+            turn.mark("first_audio")
+
+    res = loop.submit(engine.ask(   pcm = pcm,
+                                    samplerate = samplerate,
+                                    use_history = conversation is not None,
+                                    conversation = conversation,
+                                    turn = turn,
+                                    on_event = on_event)).result()
+    if "error" in res:
+        raise RuntimeError(res.get("message", res["error"]))
+
+    with turn.span("play_decode"):
+        player.load(res["response_audio_path"], system_data["play_factor"])
+    total_ms = 1000.0 * (time.perf_counter() - t_start)
+
+    data = turn.to_dict()
+    times = dict(data["totals_ms"])
+    llm_start = min(s["start_ms"] for s in data["spans"] if s["name"] == "llm")
+    for name in ("llm_first_token", "first_audio"):
+        if name in data["marks"]:
+            times[name] = data["marks"][name] - llm_start
+    times["total"] = total_ms
+    times["prompt_tokens"] = data.get("prompt_tokens", 0)
+    return times
+
+def percentiles(values):
+    return np.percentile(np.array(values), [50, 95, 99])
+
+def main():
+    from ai_voice_answers.program import DEFAULT_GPT_CONTENT
+
+    parser = argparse.ArgumentParser(description="End-to-end pipeline latency benchmark")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=5.0, help="length of the synthetic question")
+    parser.add_argument("--samplerate", type=int, default=16000)
+    parser.add_argument("--stream", action="store_true", help="stream the LLM answer and synthesize per sentence")
+    parser.add_argument("--codec", default="wav")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--prefill-ms", type=float, default=100.0, help="mock chat delay per 1000 prompt tokens")
+    parser.add_argument("--history", action="store_true", help="ask every question with the chat history")
+    parser.add_argument("--context-tokens", type=int, default=4000, help="context_max_tokens (0 sends the whole history)")
+    parser.add_argument("--no-summary", action="store_true", help="only drop old turns, never summarize them")
+    parser.add_argument("--base-url", help="use this endpoint instead of the local mock server")
+    parser.add_argument("--api-key", default="mock")
+    args = parser.parse_args()
+
+    settings = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        settings = MockSettings(latency_ms=args.latency_ms,
+                                jitter_ms=args.jitter_ms,
+                                token_ms=args.token_ms,
+                                error_rate=args.error_rate,
+                                prefill_ms=args.prefill_ms)
+        server, base_url = start_server(settings)
+        print("Mock server at", base_url)
+
+    # a configuração padrão do programa, sem caches: cada turno vai à rede
+    system_data = dict(DEFAULT_GPT_CONTENT)
+    system_data.update({
+        "api_key": args.api_key,
+        "base_url": base_url,
+        "model_llm": "mock-llm",
+        "model_transcript": "mock-transcript",
+        "model_tts": "mock-tts",
+        "tts_voice": "mock",
+        "tts_backend": "openai",
+        "language": "en",
+        "stream_response": args.stream,
+        "incremental_transcription": False,
+        "upload_codec": args.codec,
+        "tts_cache": False,
+        "transcription_cache": False,
+        "answer_cache": False,
+        "context_max_tokens": args.context_tokens,
+        "context_summarize": not args.no_summary
+    })
+
+    player = PlaybackEngine()
+    audio = recording(args.seconds, args.samplerate)
+    conversation = Conversation() if args.history else None
+    prompt_sizes = []
+
+    results = {}
+    failures = 0
+    loop = EngineLoop()
+    with tempfile.TemporaryDirectory() as dir_temp:
+        engine = PipelineEngine(lambda: system_data, dir_temp)
+        for _ in range(args.turns):
+            # sem cache de áudio decodificado: cada turno decodifica de novo
+            player.clear_cache()
+            try:
+                times = run_turn(audio, args.samplerate, engine, loop, player, system_data, conversation)
+            except Exception as e:
+                failures += 1
+                print("turn failed:", e)
+                continue
+            prompt_sizes.append(times.pop("prompt_tokens"))
+            for stage, value in times.items():
+                results.setdefault(stage, []).append(value)
+        engine.close()
+    loop.close()
+
+    print()
+    print("{} turns, {} failed, {}".format(args.turns, failures, "streaming" if args.stream else "not streaming"))
+    print("{:<22} {:>10} {:>10} {:>10}".format("stage", "p50 ms", "p95 ms", "p99 ms"))
+    # as etapas na ordem do pipeline, depois os spans HTTP (upload/espera)
+    for stage in STAGES + sorted(set(results) - set(STAGES)):
+        if not results.get(stage):
+            continue
+        p50, p95, p99 = percentiles(results[stage])
+        print("{:<22} {:>10.1f} {:>10.1f} {:>10.1f}".format(stage, p50, p95, p99))
+    if conversation is not None and prompt_sizes:
+        print()
+        print("prompt tokens: first {}, last {}, max {}".format(prompt_sizes[0], prompt_sizes[-1], max(prompt_sizes)))
+    print()
+    print("HTTP connections:", http_pool.stats())
+    if settings is not None:
+        print("Mock server requests:", settings.counts)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+'''
+Tempo de inicialização do programa da bandeja, sem display
+(plataforma offscreen do Qt):
+- tempo de importação de ai_voice_answers.program, por pacote (-X importtime);
+- custo dos módulos pesados que agora são importados depois do ícone;
+- tempo até o ícone da bandeja aparecer, medido desde o início do processo;
+- custo da integração com o desktop (.desktop, menu) na primeira execução
+  vs quando nada mudou, e do update-desktop-database que saiu da inicialização.
+
+cd src
+python3 -m benchmarks.bench_startup --repeat 5
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+def import_times(code, env):
+    """
+    Roda code com -X importtime e retorna {pacote de topo: ms}, somando o
+    tempo próprio (self) de cada módulo do pacote.
+    """
+    proc = subprocess.run(  [sys.executable, "-X", "importtime", "-c", code],
+                            env=env, capture_output=True, text=True)
+    out = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us = int(parts[0].strip())
+        except ValueError:
+            continue  # cabeçalho
+        top = parts[2].strip().split(".")[0]
+        out[top] = out.get(top, 0.0) + self_us / 1000.0
+    return out
+
+def print_import_table(title, times, top=12):
+    print(title)
+    for name, ms in sorted(times.items(), key=lambda x: -x[1])[:top]:
+        print("  {:<28} {:>9.1f} ms".format(name, ms))
+    print("  {:<28} {:>9.1f} ms".format("total", sum(times.values())))
+
+def time_to_tray(env, extra_args=()):
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "ai_voice_answers.program", "--startup-benchmark"] + list(extra_args),
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    timings = None
+    for line in proc.stdout:
+        if line.startswith("STARTUP "):
+            timings = json.loads(line[len("STARTUP "):])
+            timings["process_to_tray_ms"] = None
+            break
+    t_report = time.perf_counter()
+    proc.wait()
+    if timings is None:
+        raise RuntimeError("the program did not report its startup timings")
+    # tempo do processo até o fim da main = tempo até o relatório menos
+    # o que foi feito depois do ícone (janela + warm-up)
+    after_tray = timings["warm_up_imports_ms"] + (timings["window_ms"] - timings["tray_visible_ms"])
+    timings["process_to_tray_ms"] = round(1000 * (t_report - t0) - after_tray, 1)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark (headless)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep-home", action="store_true",
+                        help="use the real HOME (default: a temporary one, as a first run)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    if not args.keep_home:
+        env["HOME"] = tempfile.mkdtemp(prefix="bench_startup_")
+        env.pop("XDG_CACHE_HOME", None)
+
+    from ai_voice_answers.program import HEAVY_MODULES
+
+    deferred = ("import importlib\n"
+                "import ai_voice_answers.program\n"
+                "for m in %r:\n"
+                "    try: importlib.import_module(m)\n"
+                "    except Exception: pass\n") % (HEAVY_MODULES,)
+    base = import_times("import ai_voice_answers.program", env)
+    heavy = import_times(deferred, env)
+    print_import_table("import ai_voice_answers.program:", base)
+    print_import_table("deferred (warm-up after the tray icon):",
+                       {k: v - base.get(k, 0.0) for k, v in heavy.items() if v - base.get(k, 0.0) > 0.5})
+
+    runs = [time_to_tray(env) for _ in range(args.repeat)]
+    print("startup, median of {} runs:".format(args.repeat))
+    for key in runs[0]:
+        print("  {:<28} {:>9.1f} ms".format(key, statistics.median(r[key] for r in runs)))
+
+    # Integração com o desktop: HOME vazio (tudo é escrito) vs nada mudou
+    desktop_env = dict(env)
+    desktop_env["HOME"] = tempfile.mkdtemp(prefix="bench_desktop_")
+    first = time_to_tray(desktop_env, ["--applications"])
+    again = [time_to_tray(desktop_env, ["--applications"]) for _ in range(args.repeat)]
+    print("desktop integration (--applications):")
+    print("  {:<28} {:>9.1f} ms".format("first run (files written)", 
+                                        first["desktop_ms"] - first["config_ms"]))
+    print("  {:<28} {:>9.1f} ms".format("unchanged (stamp matches)", 
+                                        statistics.median(r["desktop_ms"] - r["config_ms"] for r in again)))
+    
+    t0 = time.perf_counter()
+    try:
+        subprocess.run(["update-desktop-database", 
+                        os.path.join(desktop_env["HOME"], ".local", "share", "applications")],
+                       check=True, capture_output=True)
+        print("  {:<28} {:>9.1f} ms".format("update-desktop-database", 1000 * (time.perf_counter() - t0)))
+        print("  (run in background after the UI is up, only when the .desktop file changed)")
+    except (OSError, subprocess.CalledProcessError):
+        print("  update-desktop-database not available")
+
+if __name__ == "__main__":
+    main()
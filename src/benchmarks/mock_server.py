@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+
+'''
+Servidor local que imita os endpoints OpenAI usados pelo programa via
+base_url (transcrição, chat com e sem streaming e /audio/speech para o
+tts_backend "openai"), com latência artificial e injeção de erros.
+Permite medir o pipeline sem chave da DeepInfra e sem rede.
+
+cd src
+python3 -m benchmarks.mock_server --port 8765 --latency-ms 150 --token-ms 20 --error-rate 0.05
+
+e no config.gpt.json:
+    "base_url": "http://127.0.0.1:8765/v1/openai", "api_key": "mock", "tts_backend": "openai"
+'''
+
+import io
+import json
+import time
+import wave
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+DEFAULT_TRANSCRIPTION = "What is the golden ratio and where does it appear in nature?"
+DEFAULT_ANSWER = (
+    "The golden ratio is about 1.618. "
+    "It is the ratio where the whole relates to the larger part as the larger part to the smaller. "
+    "It appears in some plant spirals, like sunflower seeds and pine cones. "
+    "Many claims about it in art and the human body are exaggerated."
+)
+
+def tone_audio(seconds=1.0, samplerate=24000):
+    """
+    Áudio de teste para a TTS falsa: mp3 (se o ffmpeg estiver disponível)
+    ou wav.
+    """
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    pcm = (0.2 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(samplerate)
+        w.writeframes(pcm.tobytes())
+    try:
+        from pydub import AudioSegment
+        out = io.BytesIO()
+        AudioSegment.from_wav(io.BytesIO(buf.getvalue())).export(out, format="mp3", bitrate="32k")
+        return out.getvalue(), "audio/mpeg"
+    except Exception:
+        return buf.getvalue(), "audio/wav"
+
+
+class MockSettings:
+    def __init__(   self,
+                    latency_ms=100.0,
+                    jitter_ms=20.0,
+                    token_ms=15.0,
+                    error_rate=0.0,
+                    prefill_ms=0.0,
+                    transcription=DEFAULT_TRANSCRIPTION,
+                    answer=DEFAULT_ANSWER,
+                    seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_ms = token_ms
+        self.error_rate = error_rate
+        # atraso por 1000 tokens (~4000 caracteres) do prompt do chat
+        self.prefill_ms = prefill_ms
+        self.transcription = transcription
+        self.answer = answer
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.speech, self.speech_type = tone_audio()
+        self.counts = {"transcriptions": 0, "chat": 0, "speech": 0, "errors": 0}
+
+    def delay(self):
+        with self.rng_lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+
+    def fail(self):
+        with self.rng_lock:
+            return self.rng.random() < self.error_rate
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # keep-alive, como a API real
+    protocol_version = "HTTP/1.1"
+    settings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        s = self.settings
+        body = self._read_body()
+        s.delay()
+
+        if s.fail():
+            s.counts["errors"] += 1
+            self._send(500, {"error": {"message": "injected error", "type": "server_error"}})
+            return
+
+        if self.path.endswith("/audio/transcriptions"):
+            s.counts["transcriptions"] += 1
+            self._send(200, {"text": s.transcription})
+        elif self.path.endswith("/chat/completions"):
+            s.counts["chat"] += 1
+            request = json.loads(body.decode("utf-8") or "{}")
+            prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+            time.sleep(s.prefill_ms * prompt_chars / 4000.0 / 1000.0)
+            if request.get("stream"):
+                self._stream_chat(request)
+            else:
+                time.sleep(s.token_ms * len(s.answer.split()) / 1000.0)
+                self._send(200, {
+                    "id": "mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": s.answer},
+                        "finish_reason": "stop"
+                    }]
+                })
+        elif self.path.endswith("/audio/speech"):
+            s.counts["speech"] += 1
+            self._send(200, s.speech, s.speech_type)
+        else:
+            self._send(404, {"error": {"message": "unknown endpoint " + self.path}})
+
+    def _stream_chat(self, request):
+        s = self.settings
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta, finish_reason=None):
+            return {
+                "id": "mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        words = s.answer.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(s.token_ms / 1000.0)
+            token = word if i == 0 else " " + word
+            self._send_chunk(b"data: " + json.dumps(event({"content": token})).encode("utf-8") + b"\n\n")
+        self._send_chunk(b"data: " + json.dumps(event({}, "stop")).encode("utf-8") + b"\n\n")
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """
+    Inicia o servidor numa thread. Retorna (server, base_url).
+    """
+    handler = type("Handler", (MockHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://{}:{}/v1/openai".format(host, server.server_address[1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI-compatible endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--prefill-ms", type=float, default=0.0, help="chat delay per 1000 prompt tokens")
+    args = parser.parse_args()
+
+    settings = MockSettings(latency_ms=args.latency_ms,
+                            jitter_ms=args.jitter_ms,
+                            token_ms=args.token_ms,
+                            error_rate=args.error_rate,
+                            prefill_ms=args.prefill_ms)
+    server, base_url = start_server(settings, args.host, args.port)
+    print("Mock server at", base_url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
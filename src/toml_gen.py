@@ -50,9 +50,14 @@ dependencies = [
     "sounddevice",
     "pydub",
     "gTTS",
+    "openai>=1.17",
+    "requests",
     "deep-consultation"
 ]
 
+[project.optional-dependencies]
+serve = ["aiohttp"]
+
 [project.urls]
 "Bug Reports" = "{__url_bugs__}"
 "Funding" = "{__url_funding__}"